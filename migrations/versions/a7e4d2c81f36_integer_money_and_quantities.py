@@ -0,0 +1,93 @@
+"""integer money and quantities
+
+Revision ID: a7e4d2c81f36
+Revises: 3f1c2a7d9b40
+Create Date: 2026-10-18 11:40:07.512930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e4d2c81f36'
+down_revision = '3f1c2a7d9b40'
+branch_labels = None
+depends_on = None
+
+# Prices become integer cents, quantities integer thousandths of a unit.
+
+
+def upgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity_available_milli', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('unit_price', sa.Integer(), nullable=True))
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('price', sa.Integer(), nullable=True))
+
+    with op.batch_alter_table('recipe_requirement', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity_required_milli', sa.Integer(), nullable=True))
+
+    op.execute(
+        "UPDATE ingredient SET"
+        " quantity_available_milli = CAST(ROUND(quantity_available * 1000) AS INTEGER),"
+        " unit_price = COALESCE(unit_price_dollars, 0) * 100 + COALESCE(unit_price_cents, 0)"
+    )
+    op.execute(
+        "UPDATE menu_item SET"
+        " price = COALESCE(price_dollars, 0) * 100 + COALESCE(price_cents, 0)"
+    )
+    op.execute(
+        "UPDATE recipe_requirement SET"
+        " quantity_required_milli = CAST(ROUND(quantity_required * 1000) AS INTEGER)"
+    )
+
+    with op.batch_alter_table('recipe_requirement', schema=None) as batch_op:
+        batch_op.drop_column('quantity_required')
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.drop_column('price_cents')
+        batch_op.drop_column('price_dollars')
+
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_column('unit_price_cents')
+        batch_op.drop_column('unit_price_dollars')
+        batch_op.drop_column('quantity_available')
+
+
+def downgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity_available', sa.NUMERIC(precision=2), nullable=True))
+        batch_op.add_column(sa.Column('unit_price_dollars', sa.INTEGER(), nullable=True))
+        batch_op.add_column(sa.Column('unit_price_cents', sa.INTEGER(), nullable=True))
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('price_dollars', sa.INTEGER(), nullable=True))
+        batch_op.add_column(sa.Column('price_cents', sa.INTEGER(), nullable=True))
+
+    with op.batch_alter_table('recipe_requirement', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity_required', sa.NUMERIC(precision=2), nullable=True))
+
+    op.execute(
+        "UPDATE ingredient SET"
+        " quantity_available = quantity_available_milli / 1000.0,"
+        " unit_price_dollars = unit_price / 100,"
+        " unit_price_cents = unit_price % 100"
+    )
+    op.execute(
+        "UPDATE menu_item SET price_dollars = price / 100, price_cents = price % 100"
+    )
+    op.execute(
+        "UPDATE recipe_requirement SET quantity_required = quantity_required_milli / 1000.0"
+    )
+
+    with op.batch_alter_table('recipe_requirement', schema=None) as batch_op:
+        batch_op.drop_column('quantity_required_milli')
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.drop_column('price')
+
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_column('unit_price')
+        batch_op.drop_column('quantity_available_milli')
@@ -0,0 +1,46 @@
+"""purchase archive own ids
+
+Revision ID: d41e8b6f2a93
+Revises: 0f4c9a1d7e62
+Create Date: 2026-10-18 21:05:37.418260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41e8b6f2a93'
+down_revision = '0f4c9a1d7e62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite reuses the ids of deleted purchases, so the original purchase id
+    # can't be the archive's primary key: it becomes a plain column and the
+    # archive numbers its rows itself
+    op.create_table('_purchase_archive_new',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('purchase_id', sa.Integer(), nullable=True),
+    sa.Column('menu_item_id', sa.Integer(), nullable=True),
+    sa.Column('time', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        "INSERT INTO _purchase_archive_new (purchase_id, menu_item_id, time, archived_at)"
+        " SELECT id, menu_item_id, time, archived_at FROM purchase_archive ORDER BY id"
+    )
+    op.drop_table('purchase_archive')
+    op.rename_table('_purchase_archive_new', 'purchase_archive')
+    with op.batch_alter_table('purchase_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_purchase_archive_menu_item_id'), ['menu_item_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_purchase_archive_time'), ['time'], unique=False)
+
+
+def downgrade():
+    # the archive's own ids are kept as the primary key: the purchase ids
+    # may repeat
+    with op.batch_alter_table('purchase_archive', schema=None) as batch_op:
+        batch_op.drop_column('purchase_id')
@@ -1,7 +1,10 @@
 import os
 from flask import Flask
 from .extensions import db, migrate, login_manager
-from . import models
+from . import models, assets, commands, metrics, planner, stock_events, storage, versions
+from .availability import availability_cache
+from .identity import identity_cache
+from .fragments import fragment_cache
 
 
 def create_app(test_config=None):
@@ -10,16 +13,29 @@ def create_app(test_config=None):
         SECRET_KEY="sk",
         SQLALCHEMY_DATABASE_URI="sqlite:///db.sqlite3",
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        PER_PAGE=50,
+        MAX_PER_PAGE=500,
+        PURCHASE_ARCHIVE_DAYS=365,
     )
-    db.init_app(app)  # initialize db for this app
-    migrate.init_app(app, db)  # initialize migrate for this app
-    login_manager.init_app(app)
 
+    # load config before the extensions read it (e.g. SQLALCHEMY_DATABASE_URI)
     if test_config is None:
         app.config.from_pyfile("config.py", silent=True)
     else:
         app.config.from_mapping(test_config)
 
+    db.init_app(app)  # initialize db for this app
+    storage.init_app(app)  # SQLite pragmas for every connection
+    migrate.init_app(app, db)  # initialize migrate for this app
+    login_manager.init_app(app)
+    availability_cache.init_app(app)
+    identity_cache.init_app(app)
+    fragment_cache.init_app(app)
+    stock_events.init_app(app)
+    planner.init_app(app)
+    assets.init_app(app)
+    commands.init_app(app)
+
     try:
         os.makedirs(app.instance_path)
     except OSError:
@@ -39,4 +55,14 @@ def create_app(test_config=None):
 
     app.register_blueprint(auth.bp)
 
+    from . import api
+
+    app.register_blueprint(api.bp)
+
+    from . import export
+
+    app.register_blueprint(export.bp)
+
+    metrics.init_app(app)
+
     return app
@@ -0,0 +1,258 @@
+import json
+import math
+from collections import defaultdict
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request
+from flask_login import login_required
+from sqlalchemy import bindparam, case, func, insert, select, update
+
+from .extensions import db
+from .models import Ingredient, MenuItem, Purchase, RecipeRequirement
+from .availability import availability_cache, mark_changed
+from .fragments import fragment_cache
+from .versions import conditional
+from . import planner, rollups, stock_events
+
+
+bp = Blueprint("api", __name__, url_prefix="/api")
+
+
+@bp.route("/menu")
+@login_required
+@conditional("menu_item", "recipe_requirement", "ingredient")
+def menu():
+    # What can be sold right now, for terminals that poll:
+    # {"items": [{"id": 1, "title": "...", "price": 1250, "available": true}]}
+    # price is in cents; ?servings=1 adds "max_servings", the number of
+    # portions the current stock allows (null if no ingredient limits it).
+    # Repeated polls get a 304 from the ETag, and the body itself is cached
+    # until the tables change, so a poll costs one or two small queries.
+    servings = request.args.get("servings", type=int, default=0) == 1
+
+    def render():
+        available_ids = availability_cache.available_ids()
+        max_servings = _max_servings() if servings else {}
+        items = []
+        for id, title, price in db.session.execute(
+            select(MenuItem.id, MenuItem.title, MenuItem.price).order_by(MenuItem.id)
+        ):
+            item = {
+                "id": id,
+                "title": title,
+                "price": price,
+                "available": id in available_ids,
+            }
+            if servings:
+                item["max_servings"] = max_servings.get(id, 0)
+            items.append(item)
+        return json.dumps({"items": items}, ensure_ascii=False, separators=(",", ":"))
+
+    body = fragment_cache.render(
+        "api.menu", ("menu_item", "recipe_requirement", "ingredient"), render
+    )
+    return Response(str(body), mimetype="application/json")
+
+
+def _max_servings():
+    # menu_item_id -> min(available // required) over its requirements;
+    # requirements asking for nothing don't limit it, so an item with only
+    # such requirements gets None. Items without requirements can't be sold
+    # and are left out (0).
+    portions = case(
+        (
+            RecipeRequirement.quantity_required_milli > 0,
+            Ingredient.quantity_available_milli
+            // RecipeRequirement.quantity_required_milli,
+        ),
+    )
+    return dict(
+        db.session.execute(
+            select(RecipeRequirement.menu_item_id, func.min(portions))
+            .join(Ingredient, RecipeRequirement.ingredient_id == Ingredient.id)
+            .group_by(RecipeRequirement.menu_item_id)
+        ).all()
+    )
+
+
+@bp.route("/capacity", methods=["GET", "POST"])
+@login_required
+def capacity():
+    # GET: max servings of every menu item.
+    # POST {"mix": {"<menu item id>": servings per hour}}: also which
+    # ingredients and dishes run out first under that sales mix, and when.
+    mix = {}
+    if request.method == "POST":
+        data = request.get_json(silent=True)
+        raw = data.get("mix") if isinstance(data, dict) else None
+        if not isinstance(raw, dict):
+            return jsonify(error="ожидается объект 'mix'"), 400
+        try:
+            mix = {int(id): float(rate) for id, rate in raw.items()}
+        except (TypeError, ValueError):
+            return jsonify(error="mix: id блюда -> число порций в час"), 400
+        if not all(math.isfinite(rate) for rate in mix.values()):
+            return jsonify(error="mix: число порций в час должно быть конечным"), 400
+    matrix = planner.matrix()
+    stock = planner.stock()
+    result = {"menu_items": planner.max_servings(matrix, stock)}
+    if mix:
+        result["what_if"] = planner.what_if(matrix, stock, mix)
+    return jsonify(result)
+
+
+@bp.route("/stock/events")
+@login_required
+def stock_event_stream():
+    # text/event-stream of stock deltas, see stock_events.py
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    return Response(
+        stock_events.stream(last_event_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+BATCH_MAX_LINES = 1000
+BATCH_MAX_QUANTITY = 100  # servings of one dish in one line
+
+
+@bp.route("/purchases/batch", methods=["POST"])
+@login_required
+def purchases_batch():
+    # A POS terminal sends a batch of lines:
+    # {"lines": [{"menu_item_id": 1, "quantity": 2, "time": "2024-01-01T12:00:00"}]}
+    # Lines are accepted in order while there is enough stock for them,
+    # then all purchases and ingredient decrements go in one transaction.
+    data = request.get_json(silent=True)
+    lines = data.get("lines") if isinstance(data, dict) else data
+    if not isinstance(lines, list):
+        return jsonify(error="ожидается список позиций 'lines'"), 400
+    if len(lines) > BATCH_MAX_LINES:
+        return jsonify(error=f"не больше {BATCH_MAX_LINES} позиций за раз"), 400
+
+    results = [None] * len(lines)
+    parsed = []
+    for i, line in enumerate(lines):
+        try:
+            parsed.append((i,) + _parse_line(line))
+        except ValueError as e:
+            results[i] = {"line": i, "status": "error", "error": str(e)}
+
+    menu_item_ids = set(
+        db.session.scalars(
+            select(MenuItem.id).where(
+                MenuItem.id.in_({menu_item_id for _, menu_item_id, _, _ in parsed})
+            )
+        )
+    )
+    for i, menu_item_id, _, _ in parsed:
+        if menu_item_id not in menu_item_ids:
+            results[i] = {
+                "line": i,
+                "status": "error",
+                "error": f"блюдо {menu_item_id} не найдено",
+            }
+    parsed = [line for line in parsed if line[1] in menu_item_ids]
+    requirements = defaultdict(list)
+    for menu_item_id, ingredient_id, quantity_required in db.session.execute(
+        select(
+            RecipeRequirement.menu_item_id,
+            RecipeRequirement.ingredient_id,
+            RecipeRequirement.quantity_required_milli,
+        ).where(RecipeRequirement.menu_item_id.in_(menu_item_ids))
+    ):
+        requirements[menu_item_id].append((ingredient_id, quantity_required))
+    stock = dict(
+        db.session.execute(
+            select(Ingredient.id, Ingredient.quantity_available_milli).where(
+                Ingredient.id.in_(
+                    {ing_id for rrs in requirements.values() for ing_id, _ in rrs}
+                )
+            )
+        ).all()
+    )
+
+    # aggregated demand of the accepted lines, per ingredient
+    demand = defaultdict(int)
+    purchases = []
+    for i, menu_item_id, quantity, time in parsed:
+        if not requirements[menu_item_id]:
+            results[i] = {"line": i, "status": "error", "error": "блюдо недоступно"}
+            continue
+        short = [
+            ingredient_id
+            for ingredient_id, quantity_required in requirements[menu_item_id]
+            if demand[ingredient_id] + quantity_required * quantity
+            > stock[ingredient_id]
+        ]
+        if short:
+            results[i] = {
+                "line": i,
+                "status": "error",
+                "error": "не хватает ингредиентов",
+                "ingredient_ids": short,
+            }
+            continue
+        for ingredient_id, quantity_required in requirements[menu_item_id]:
+            demand[ingredient_id] += quantity_required * quantity
+        purchases += [{"menu_item_id": menu_item_id, "time": time}] * quantity
+        results[i] = {"line": i, "status": "ok", "quantity": quantity}
+
+    if purchases:
+        # the same conditional UPDATE as MenuItem.take_ingredients(), as executemany
+        table = Ingredient.__table__
+        result = db.session.execute(
+            update(table)
+            .where(
+                table.c.id == bindparam("ingredient_id"),
+                table.c.quantity_available_milli >= bindparam("quantity"),
+            )
+            .values(
+                quantity_available_milli=table.c.quantity_available_milli
+                - bindparam("quantity")
+            ),
+            [
+                {"ingredient_id": ingredient_id, "quantity": quantity}
+                for ingredient_id, quantity in demand.items()
+            ],
+        )
+        if result.rowcount != len(demand):
+            # stock changed since we read it: another till was faster
+            db.session.rollback()
+            return jsonify(error="остатки изменились, повторите запрос"), 409
+        db.session.execute(insert(Purchase), purchases)
+        rollups.add_purchases((p["menu_item_id"], p["time"]) for p in purchases)
+        mark_changed(db.session, ingredient_ids=demand.keys())
+        db.session.commit()
+
+    return jsonify(
+        accepted=sum(1 for r in results if r["status"] == "ok"),
+        purchases=len(purchases),
+        results=results,
+    )
+
+
+def _parse_line(line):
+    if not isinstance(line, dict):
+        raise ValueError("позиция должна быть объектом")
+    try:
+        menu_item_id = int(line["menu_item_id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("нужен menu_item_id")
+    if not 0 < menu_item_id < 2**63:
+        raise ValueError(f"блюдо {menu_item_id} не найдено")
+    try:
+        quantity = int(line.get("quantity", 1))
+    except (TypeError, ValueError):
+        raise ValueError("quantity должно быть целым числом")
+    if quantity < 1:
+        raise ValueError("quantity должно быть больше нуля")
+    if quantity > BATCH_MAX_QUANTITY:
+        raise ValueError(f"quantity не может быть больше {BATCH_MAX_QUANTITY}")
+    time = datetime.utcnow()
+    if line.get("time"):
+        try:
+            time = datetime.fromisoformat(line["time"])
+        except (TypeError, ValueError):
+            raise ValueError("time должно быть в формате ISO 8601")
+    return menu_item_id, quantity, time
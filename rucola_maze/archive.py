@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
+
+from .extensions import db
+from .models import ArchivedSales, Purchase, PurchaseArchive
+
+
+# Purchase archiving: purchases older than a horizon move to PurchaseArchive,
+# and ArchivedSales keeps their number per menu item so the all-time totals
+# (Purchase.revenue_cents() etc.) and the sales rollups don't change.
+# Work is done in small batches, each its own short transaction (copy, count,
+# delete, commit), with a pause in between so tills never wait long for the
+# write lock. Every batch is complete or not done at all, so an interrupted
+# run is simply started again.
+
+
+def cutoff(config, now=None):
+    days = config["PURCHASE_ARCHIVE_DAYS"]
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def archive_batch(before, batch_size=500):
+    # moves up to batch_size purchases older than `before`; doesn't commit.
+    # Returns how many were moved.
+    ids = list(
+        db.session.scalars(
+            select(Purchase.id).where(Purchase.time < before).limit(batch_size)
+        )
+    )
+    if not ids:
+        return 0
+    db.session.execute(
+        insert(PurchaseArchive).from_select(
+            ["purchase_id", "menu_item_id", "time", "archived_at"],
+            select(
+                Purchase.id,
+                Purchase.menu_item_id,
+                Purchase.time,
+                literal(datetime.utcnow()),
+            ).where(Purchase.id.in_(ids)),
+        )
+    )
+    counts = db.session.execute(
+        select(Purchase.menu_item_id, func.count())
+        .where(Purchase.id.in_(ids), Purchase.menu_item_id.is_not(None))
+        .group_by(Purchase.menu_item_id)
+    ).all()
+    if counts:
+        stmt = sqlite_insert(ArchivedSales)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["menu_item_id"],
+            set_={"purchases": ArchivedSales.purchases + stmt.excluded.purchases},
+        )
+        db.session.execute(
+            stmt,
+            [{"menu_item_id": id, "purchases": n} for id, n in counts],
+        )
+    db.session.execute(delete(Purchase).where(Purchase.id.in_(ids)))
+    return len(ids)
+
+
+def archive(before, batch_size=500, pause=0.05, limit=None, progress=None):
+    # batches until nothing older than `before` is left (or `limit` purchases
+    # were moved); progress(moved so far) is called after every commit
+    moved = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        n = archive_batch(before, size)
+        db.session.commit()
+        if not n:
+            break
+        moved += n
+        if progress:
+            progress(moved)
+        time.sleep(pause)
+    return moved
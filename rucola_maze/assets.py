@@ -0,0 +1,252 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+import flask
+from flask import current_app, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional: without it only .gz variants are built
+    brotli = None
+
+
+# Static asset pipeline.
+# `flask assets vendor` downloads the third-party CSS and fonts base.html used
+# to load from CDNs into static/vendor; run it once per install, with network
+# access. `flask assets build` then copies every static file to static/dist
+# under a content-hashed name, with .gz (and .br, if the brotli package is
+# installed) variants of text files, and writes static/dist/manifest.json.
+# Templates keep calling url_for('static', filename=...): the url_for we put in
+# the Jinja globals turns that into /assets/<hashed name> when the file is in
+# the manifest. Hashed files never change, so they are served with a year long
+# immutable Cache-Control. Until `flask assets vendor` has been run, the
+# vendored files are linked from their CDNs (ASSETS_CDN_FALLBACK, on by
+# default); with the fallback off a missing file is an error in the log at
+# startup (and a 404), so a deployment that must not load CDNs notices.
+# A build keeps the files of the previous one, and list page ETags include the
+# manifest version, so a cached page never points at deleted files.
+
+VENDOR = {
+    "vendor/bootstrap.min.css": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@4.1.3/dist/css/bootstrap.min.css"
+    ),
+    "vendor/fonts.css": (
+        "https://fonts.googleapis.com/css2?family=PT+Sans&family=Nunito"
+    ),
+}
+
+# Google Fonts only returns woff2 to browsers it recognises
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+)
+
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".map"}
+DIST = "dist"
+MANIFEST = "manifest.json"
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+
+def init_app(app):
+    app.config.setdefault("ASSETS_FINGERPRINT", not app.debug)
+    app.config.setdefault("ASSETS_MAX_AGE", 365 * 24 * 3600)
+    app.config.setdefault("ASSETS_CDN_FALLBACK", True)
+    missing = missing_vendor_files(app.static_folder)
+    if missing and not app.config["ASSETS_CDN_FALLBACK"]:
+        app.logger.error(
+            "Vendored static files are missing: %s. Run 'flask assets vendor'"
+            " (or set ASSETS_CDN_FALLBACK to load them from their CDNs).",
+            ", ".join(missing),
+        )
+    manifest = load_manifest(app.static_folder)
+    app.extensions["assets"] = {
+        "manifest": manifest,
+        "version": manifest_version(manifest),
+        "cdn": missing if app.config["ASSETS_CDN_FALLBACK"] else {},
+    }
+    app.add_url_rule("/assets/<path:filename>", "assets", serve)
+    app.jinja_env.globals["url_for"] = url_for
+
+
+def missing_vendor_files(static_folder):
+    return {
+        name: url
+        for name, url in VENDOR.items()
+        if not os.path.exists(os.path.join(static_folder, name))
+    }
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def manifest_version(manifest):
+    if not manifest:
+        return ""
+    content = json.dumps(manifest, sort_keys=True).encode()
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def url_for(endpoint, **values):
+    if endpoint == "static" and "filename" in values:
+        state = current_app.extensions["assets"]
+        filename = values["filename"]
+        if filename in state["cdn"]:
+            return state["cdn"][filename]
+        if current_app.config["ASSETS_FINGERPRINT"] and filename in state["manifest"]:
+            values["filename"] = state["manifest"][filename]
+            return flask.url_for("assets", **values)
+    return flask.url_for(endpoint, **values)
+
+
+def serve(filename):
+    root = os.path.join(current_app.static_folder, DIST)
+    path = safe_join(root, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    encoding = None
+    for candidate, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if candidate in request.accept_encodings and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        max_age=current_app.config["ASSETS_MAX_AGE"],
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.cache_control.immutable = True
+    return response
+
+
+def vendor(static_folder):
+    # returns the names of the files written
+    written = []
+    for name, url in VENDOR.items():
+        content = _download(url)
+        if name.endswith(".css"):
+            content = _vendor_css_urls(content, url, static_folder, name, written)
+        path = os.path.join(static_folder, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        written.append(name)
+    return written
+
+
+def _download(url):
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return response.read()
+
+
+def _vendor_css_urls(content, base_url, static_folder, name, written):
+    # fonts and images referenced by absolute URLs are downloaded next to the
+    # stylesheet and the CSS is pointed at the local copies
+    directory = os.path.dirname(name)
+
+    def replace(match):
+        url = match.group(2)
+        if not url.startswith(("http://", "https://")):
+            return match.group(0)
+        local = "fonts/" + os.path.basename(url.split("?")[0])
+        path = os.path.join(static_folder, directory, local)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(_download(url))
+        written.append(f"{directory}/{local}")
+        return f"url({local})"
+
+    return CSS_URL.sub(replace, content.decode()).encode()
+
+
+def build(static_folder):
+    # fingerprint everything under static/ except dist/ itself; returns the
+    # manifest. Files of the previous build stay (pages cached by browsers
+    # may still link them), older ones are removed.
+    dist = os.path.join(static_folder, DIST)
+    previous = load_manifest(static_folder)
+
+    names = []
+    for directory, subdirectories, filenames in os.walk(static_folder):
+        subdirectories[:] = [
+            d for d in subdirectories
+            if os.path.join(directory, d) != dist
+        ]
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            names.append(os.path.relpath(path, static_folder).replace(os.sep, "/"))
+    # stylesheets last, so the files they reference already have hashed names
+    names.sort(key=lambda name: (name.endswith(".css"), name))
+
+    manifest = {}
+    for name in names:
+        with open(os.path.join(static_folder, name), "rb") as f:
+            content = f.read()
+        if name.endswith(".css"):
+            content = _rewrite_css_urls(content, name, manifest)
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+        manifest[name] = hashed
+
+        path = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        if ext in COMPRESSIBLE:
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + ".br", "wb") as f:
+                    f.write(brotli.compress(content, quality=11))
+
+    os.makedirs(dist, exist_ok=True)
+    with open(os.path.join(dist, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _prune(dist, set(manifest.values()) | set(previous.values()))
+    return manifest
+
+
+def _prune(dist, keep):
+    for directory, subdirectories, filenames in os.walk(dist, topdown=False):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, dist).replace(os.sep, "/")
+            for suffix in (".gz", ".br"):
+                if name.endswith(suffix):
+                    name = name[: -len(suffix)]
+            if name != MANIFEST and name not in keep:
+                os.remove(path)
+        if directory != dist and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+def _rewrite_css_urls(content, name, manifest):
+    directory = os.path.dirname(name)
+
+    def replace(match):
+        url = match.group(2)
+        target = os.path.normpath(os.path.join(directory, url)).replace(os.sep, "/")
+        if target not in manifest:
+            return match.group(0)
+        return f"url({os.path.relpath(manifest[target], directory or '.')})".replace(
+            os.sep, "/"
+        )
+
+    return CSS_URL.sub(replace, content.decode()).encode()
@@ -0,0 +1,211 @@
+import threading
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+
+from .extensions import db
+from .models import Ingredient, MenuItem, RecipeRequirement
+from . import stock_events
+
+
+# In-process cache of available menu item ids.
+# Next to it we keep an inverted index ingredient_id -> menu_item_ids built from
+# RecipeRequirement, so a stock change only recomputes the dishes that use
+# that ingredient. Changes are picked up from session flushes and applied
+# after commit (a rollback discards them).
+# The cache lives in one process: with several workers, either turn it off
+# (AVAILABILITY_CACHE = False) or accept that other workers see a change
+# only after their own writes touch the same rows.
+# The same changes are appended to the StockChange log inside the writing
+# transaction, for the cross-process event stream (stock_events.py).
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.built = False
+        self.available = set()
+        self.menu_items_by_ingredient = {}
+        self.ingredients_by_menu_item = {}
+        self.dirty_ingredients = set()
+        self.dirty_menu_items = set()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.recomputed_menu_items = 0
+
+
+class AvailabilityCache:
+    def init_app(self, app):
+        app.config.setdefault("AVAILABILITY_CACHE", True)
+        app.extensions["availability_cache"] = _State()
+
+    def _state(self):
+        return current_app.extensions["availability_cache"]
+
+    def enabled(self):
+        return current_app.config["AVAILABILITY_CACHE"]
+
+    def available_ids(self):
+        if not self.enabled():
+            return MenuItem.available_ids()
+        state = self._state()
+        with state.lock:
+            if not state.built:
+                state.misses += 1
+                self._rebuild(state)
+            elif state.dirty_ingredients or state.dirty_menu_items:
+                state.misses += 1
+                self._refresh(state)
+            else:
+                state.hits += 1
+            return set(state.available)
+
+    def available_menu_items(self):
+        if not self.enabled():
+            return MenuItem.available()
+        return MenuItem.query.filter(MenuItem.id.in_(self.available_ids()))
+
+    def rebuild(self):
+        # force a full rebuild, e.g. after the database was changed by hand
+        state = self._state()
+        with state.lock:
+            self._rebuild(state)
+
+    def invalidate(self, ingredient_ids=(), menu_item_ids=()):
+        state = self._state()
+        with state.lock:
+            state.dirty_ingredients.update(ingredient_ids)
+            state.dirty_menu_items.update(menu_item_ids)
+
+    def stats(self):
+        state = self._state()
+        with state.lock:
+            return {
+                "enabled": self.enabled(),
+                "built": state.built,
+                "hits": state.hits,
+                "misses": state.misses,
+                "rebuilds": state.rebuilds,
+                "recomputed_menu_items": state.recomputed_menu_items,
+                "available": len(state.available),
+            }
+
+    def _rebuild(self, state):
+        state.menu_items_by_ingredient = {}
+        state.ingredients_by_menu_item = {}
+        rows = db.session.execute(
+            select(RecipeRequirement.ingredient_id, RecipeRequirement.menu_item_id)
+        )
+        for ingredient_id, menu_item_id in rows:
+            self._index(state, ingredient_id, menu_item_id)
+        state.available = MenuItem.available_ids()
+        state.dirty_ingredients.clear()
+        state.dirty_menu_items.clear()
+        state.built = True
+        state.rebuilds += 1
+
+    def _refresh(self, state):
+        # recipes of these menu items changed: re-read their index entries
+        if state.dirty_menu_items:
+            for menu_item_id in state.dirty_menu_items:
+                for ingredient_id in state.ingredients_by_menu_item.pop(
+                    menu_item_id, ()
+                ):
+                    state.menu_items_by_ingredient.get(ingredient_id, set()).discard(
+                        menu_item_id
+                    )
+            rows = db.session.execute(
+                select(
+                    RecipeRequirement.ingredient_id, RecipeRequirement.menu_item_id
+                ).where(RecipeRequirement.menu_item_id.in_(state.dirty_menu_items))
+            )
+            for ingredient_id, menu_item_id in rows:
+                self._index(state, ingredient_id, menu_item_id)
+
+        affected = set(state.dirty_menu_items)
+        for ingredient_id in state.dirty_ingredients:
+            affected |= state.menu_items_by_ingredient.get(ingredient_id, set())
+
+        if affected:
+            now_available = set(
+                db.session.scalars(
+                    MenuItem.available_ids_select().where(
+                        RecipeRequirement.menu_item_id.in_(affected)
+                    )
+                )
+            )
+            state.available = (state.available - affected) | now_available
+            state.recomputed_menu_items += len(affected)
+        state.dirty_ingredients.clear()
+        state.dirty_menu_items.clear()
+
+    def _index(self, state, ingredient_id, menu_item_id):
+        state.menu_items_by_ingredient.setdefault(ingredient_id, set()).add(
+            menu_item_id
+        )
+        state.ingredients_by_menu_item.setdefault(menu_item_id, set()).add(
+            ingredient_id
+        )
+
+
+availability_cache = AvailabilityCache()
+
+
+# Session events: collect what changed during flushes, hand it to the cache
+# once the transaction commits.
+
+
+def _pending(session):
+    return session.info.setdefault(
+        "availability_pending", {"ingredients": set(), "menu_items": set()}
+    )
+
+
+def mark_changed(session, ingredient_ids=(), menu_item_ids=()):
+    # for writes that bypass the unit of work, e.g. MenuItem.take_ingredients()
+    pending = _pending(session)
+    pending["ingredients"].update(ingredient_ids)
+    pending["menu_items"].update(menu_item_ids)
+    stock_events.record(session, ingredient_ids, menu_item_ids)
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_changes(session, flush_context):
+    ingredients = set()
+    menu_items = set()
+    for obj in session.dirty:
+        if isinstance(obj, Ingredient):
+            if inspect(obj).attrs.quantity_available_milli.history.has_changes():
+                ingredients.add(obj.id)
+        elif isinstance(obj, RecipeRequirement):
+            state = inspect(obj)
+            menu_items.add(obj.menu_item_id)
+            menu_items.update(state.attrs.menu_item_id.history.deleted)
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, RecipeRequirement):
+            menu_items.add(obj.menu_item_id)
+        elif isinstance(obj, MenuItem):
+            menu_items.add(obj.id)
+        elif isinstance(obj, Ingredient):
+            ingredients.add(obj.id)
+    ingredients.discard(None)
+    menu_items.discard(None)
+    if ingredients or menu_items:
+        mark_changed(session, ingredients, menu_items)
+
+
+@event.listens_for(db.session, "after_commit")
+def _apply_changes(session):
+    pending = session.info.pop("availability_pending", None)
+    if not has_app_context() or not availability_cache.enabled():
+        return
+    if pending and (pending["ingredients"] or pending["menu_items"]):
+        availability_cache.invalidate(
+            ingredient_ids=pending["ingredients"] - {None},
+            menu_item_ids=pending["menu_items"] - {None},
+        )
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("availability_pending", None)
@@ -0,0 +1,164 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy import event, select
+
+from .extensions import db
+from .models import MenuItem, RecipeRequirement, User
+from . import seed
+
+
+# Query-level benchmark of the inventory views and model methods.
+# Every dataset size gets its own scratch SQLite file, filled by seed.generate();
+# each target is run through the Flask test client several times and we keep
+# the median latency and the number of SQL statements it issued.
+# Results are plain JSON so a run can be saved as a baseline and compared
+# against later commits. The other benchmarks live next to this one, one
+# module per area (bench_storage, bench_events, bench_batch, bench_deliveries,
+# bench_load), and share SIZES and percentile().
+
+SIZES = {
+    "small": dict(ingredients=50, menu_items=30, requirements=5, purchases=1_000),
+    "medium": dict(ingredients=200, menu_items=100, requirements=8, purchases=20_000),
+    "large": dict(ingredients=500, menu_items=300, requirements=12, purchases=200_000),
+}
+
+PAGES = [
+    ("inventory.home", "/"),
+    ("inventory.home (range)", "/?from=2023-12-01&to=2023-12-31"),
+    ("inventory.ingredients", "/ingredients/"),
+    ("inventory.menu_items", "/menu_items/"),
+    ("inventory.recipe_requirements", "/recipe_requirements/"),
+    ("inventory.purchases", "/purchases/"),
+    ("inventory.purchase_new (GET)", "/purchases/new"),
+]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def _measure(fn, counter, repeat):
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        counter.count = 0
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+        queries = counter.count
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "queries": queries,
+    }
+
+
+def run_size(name, repeat=5, config=None):
+    from . import create_app
+
+    params = SIZES[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "WTF_CSRF_ENABLED": False,
+                **(config or {}),
+            }
+        )
+        results = {}
+        with app.app_context():
+            seed.generate(**params)
+            user = User(username="bench", email="bench@example.com")
+            user.set_password("bench")
+            db.session.add(user)
+            db.session.commit()
+            counter = QueryCounter(db.engine)
+            menu_item_id = min(MenuItem.available_ids())
+
+            client = app.test_client()
+            client.post(
+                "/auth/login", data={"email": "bench@example.com", "password": "bench"}
+            )
+            for label, url in PAGES:
+                results[label] = _measure(lambda: client.get(url), counter, repeat)
+            results["inventory.purchase_new (POST)"] = _measure(
+                lambda: client.post(
+                    "/purchases/new", data={"available_menu_items": menu_item_id}
+                ),
+                counter,
+                repeat,
+            )
+
+            def all_is_available():
+                db.session.expire_all()
+                for menu_item in MenuItem.query.all():
+                    menu_item.is_available()
+
+            def all_in_stock():
+                db.session.expire_all()
+                for rr in db.session.scalars(select(RecipeRequirement)):
+                    rr.in_stock()
+
+            results["MenuItem.is_available (all)"] = _measure(
+                all_is_available, counter, repeat
+            )
+            results["RecipeRequirement.in_stock (all)"] = _measure(
+                all_in_stock, counter, repeat
+            )
+            results["MenuItem.available_ids"] = _measure(
+                MenuItem.available_ids, counter, repeat
+            )
+            db.session.remove()
+            db.engine.dispose()
+    return {"params": params, "results": results}
+
+
+def run(sizes=("small", "medium"), repeat=5, config=None):
+    return {name: run_size(name, repeat, config) for name in sizes}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def compare(current, baseline, threshold=1.5):
+    # lines describing targets that got slower than threshold x baseline or
+    # issue more queries than before
+    regressions = []
+    for size, data in current.items():
+        old_results = baseline.get(size, {}).get("results", {})
+        for target, result in data["results"].items():
+            old = old_results.get(target)
+            if old is None:
+                continue
+            if result["queries"] > old["queries"]:
+                regressions.append(
+                    f"{size} {target}: {old['queries']} -> {result['queries']} queries"
+                )
+            if result["median_ms"] > old["median_ms"] * threshold:
+                regressions.append(
+                    f"{size} {target}: {old['median_ms']} -> {result['median_ms']} ms"
+                )
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
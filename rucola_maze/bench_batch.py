@@ -0,0 +1,58 @@
+import os
+import random
+import tempfile
+import time
+
+from .extensions import db
+from .models import MenuItem, User
+from .bench import SIZES
+from . import seed
+
+
+# Sales through the purchase form against /api/purchases/batch, for
+# `flask bench-batch`.
+
+def run(lines=200):
+    # a till's sales posted through the purchase form one by one vs. in one
+    # request to /api/purchases/batch, both through the test client
+    from . import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        app = create_app(
+            {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "WTF_CSRF_ENABLED": False}
+        )
+        with app.app_context():
+            seed.generate(**SIZES["small"])
+            user = User(username="bench", email="bench@example.com")
+            user.set_password("bench")
+            db.session.add(user)
+            db.session.commit()
+            menu_item_ids = sorted(MenuItem.available_ids())
+        client = app.test_client()
+        client.post(
+            "/auth/login", data={"email": "bench@example.com", "password": "bench"}
+        )
+        rnd = random.Random(0)
+        sales = [rnd.choice(menu_item_ids) for _ in range(lines)]
+
+        start = time.perf_counter()
+        for menu_item_id in sales:
+            client.post("/purchases/new", data={"available_menu_items": menu_item_id})
+        form_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post(
+            "/api/purchases/batch",
+            json={"lines": [{"menu_item_id": id} for id in sales]},
+        )
+        batch_s = time.perf_counter() - start
+        accepted = response.get_json()["accepted"]
+        with app.app_context():
+            db.engine.dispose()
+    return {
+        "lines": lines,
+        "accepted": accepted,
+        "form_lines_per_s": round(lines / form_s),
+        "batch_lines_per_s": round(lines / batch_s),
+    }
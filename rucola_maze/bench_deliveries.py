@@ -0,0 +1,58 @@
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import select
+
+from .extensions import db
+from .models import Ingredient
+from . import deliveries, seed
+
+
+# Bulk delivery import (deliveries.py) against per-line updates, for
+# `flask bench-delivery`.
+
+def run(rows=10_000, baseline_rows=500):
+    # bulk import of a delivery file (half known, half new ingredients) vs.
+    # one update and commit per line, as with the ingredient edit form
+    from . import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+        with app.app_context():
+            seed.generate(ingredients=rows // 2, menu_items=50, purchases=0)
+            db.session.commit()
+            rnd = random.Random(0)
+            lines = ["name,quantity,unit,unit_price"]
+            for i in range(rows):
+                lines.append(
+                    f"ingredient-{i:05d},{rnd.randint(1, 50_000) / 1000},"
+                    f"{seed.UNITS[0] if i >= rows // 2 else ''},"
+                    f"{rnd.randint(10, 100_000) / 100}"
+                )
+            data = "\n".join(lines)
+
+            start = time.perf_counter()
+            results = deliveries.import_lines(deliveries.read(data))
+            db.session.commit()
+            bulk_s = time.perf_counter() - start
+            counts = deliveries.summary(results)
+
+            names = [f"ingredient-{i:05d}" for i in range(min(baseline_rows, rows // 2))]
+            start = time.perf_counter()
+            for name in names:
+                ingredient = db.session.scalar(
+                    select(Ingredient).where(Ingredient.name == name)
+                )
+                ingredient.quantity_available_milli += 1000
+                db.session.commit()
+            per_line_s = time.perf_counter() - start
+            db.engine.dispose()
+    return {
+        "rows": rows,
+        **counts,
+        "bulk_s": round(bulk_s, 3),
+        "bulk_rows_per_s": round(rows / bulk_s),
+        "per_line_rows_per_s": round(len(names) / per_line_s) if names else None,
+    }
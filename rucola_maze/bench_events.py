@@ -0,0 +1,152 @@
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from .extensions import db
+from .models import MenuItem, OutOfStock, Purchase, User
+from .availability import mark_changed
+from .bench import SIZES, percentile
+from . import seed
+
+
+# Latency of the stock event stream (stock_events.py) for `flask bench-events`:
+# a writer process sells dishes while many SSE clients on a local server
+# note when each change reaches them.
+
+def _event_writer(path, menu_item_ids, writes, interval, results):
+    # runs in its own process: sells dishes and reports, per write, the
+    # ingredient quantities it left behind and when it committed
+    from . import create_app
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    rnd = random.Random(0)
+    with app.app_context():
+        for _ in range(writes):
+            time.sleep(interval)
+            menu_item = db.session.get(MenuItem, rnd.choice(menu_item_ids))
+            try:
+                ingredient_ids = menu_item.take_ingredients()
+            except OutOfStock:
+                db.session.rollback()
+                continue
+            db.session.add(Purchase(menu_item_id=menu_item.id))
+            mark_changed(db.session, ingredient_ids=ingredient_ids)
+            db.session.commit()
+            committed = time.time()
+            for rr in menu_item.in_recipe_requirements:
+                db.session.refresh(rr.ingredient)
+                results.put(
+                    (rr.ingredient_id, rr.ingredient.quantity_available_milli, committed)
+                )
+    results.put(None)
+
+
+def _event_client(port, cookie, received, ready):
+    # one SSE connection; received[(ingredient id, quantity)] = arrival time
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    connection.request("GET", "/api/stock/events", headers={"Cookie": cookie})
+    response = connection.getresponse()
+    ready.release()
+    try:
+        for line in response:
+            if not line.startswith(b"data: "):
+                continue
+            now = time.time()
+            for ingredient in json.loads(line[6:]).get("ingredients", []):
+                key = (ingredient["id"], ingredient["quantity_available_milli"])
+                received.setdefault(key, now)
+    except (OSError, ValueError, http.client.HTTPException):
+        pass  # closed at the end of the run
+
+
+def run(clients=10, writes=50, interval=0.1, poll=0.05, size="small"):
+    # latency from a commit in another process to its arrival on every open
+    # stream, with `clients` concurrent streams on a local server
+    from werkzeug.serving import make_server
+    from . import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "WTF_CSRF_ENABLED": False,
+                "STOCK_EVENTS_POLL": poll,
+            }
+        )
+        with app.app_context():
+            seed.generate(**SIZES[size])
+            user = User(username="bench", email="bench@example.com")
+            user.set_password("bench")
+            db.session.add(user)
+            db.session.commit()
+            menu_item_ids = sorted(MenuItem.available_ids())
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        login = app.test_client().post(
+            "/auth/login", data={"email": "bench@example.com", "password": "bench"}
+        )
+        cookie = login.headers["Set-Cookie"].split(";")[0]
+
+        ready = threading.Semaphore(0)
+        received = [{} for _ in range(clients)]
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(
+                target=_event_client,
+                args=(server.server_port, cookie, received[n], ready),
+                daemon=True,
+            )
+            for n in range(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            ready.acquire()
+        connect_s = time.perf_counter() - start
+
+        results = multiprocessing.get_context("spawn").Queue()
+        writer = multiprocessing.get_context("spawn").Process(
+            target=_event_writer, args=(path, menu_item_ids, writes, interval, results)
+        )
+        writer.start()
+        committed = {}
+        while (item := results.get()) is not None:
+            ingredient_id, quantity, at = item
+            committed[(ingredient_id, quantity)] = at
+        writer.join()
+        time.sleep(poll * 10 + 0.5)
+        app.extensions["stock_events"].close()
+        server.shutdown()
+        for thread in threads:
+            thread.join()
+
+        latencies = []
+        missed = 0
+        for client in received:
+            for key, at in committed.items():
+                if key in client:
+                    latencies.append((client[key] - at) * 1000)
+                else:
+                    # several writes within one poll are sent as one delta
+                    missed += 1
+        with app.app_context():
+            db.engine.dispose()
+    return {
+        "clients": clients,
+        "changes": len(committed),
+        "connect_ms": round(connect_s * 1000, 1),
+        "delivered": len(latencies),
+        "coalesced": missed,
+        "p50_ms": round(percentile(latencies, 50) or 0, 1),
+        "p95_ms": round(percentile(latencies, 95) or 0, 1),
+        "p99_ms": round(percentile(latencies, 99) or 0, 1),
+    }
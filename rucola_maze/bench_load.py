@@ -0,0 +1,259 @@
+import http.client
+import http.cookies
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import OperationalError
+
+from .extensions import db
+from .models import Ingredient, Purchase, User
+from .availability import mark_changed
+from .bench import SIZES, percentile
+from . import seed
+
+
+# Multi-process HTTP load test for `flask bench-load`: till processes log
+# in, look at the menu and sell against a local threaded server.
+
+# what a till does between two logins, with relative weights
+LOAD_MIX = [("menu", 6), ("purchase", 3), ("login", 0.5)]
+TILL_START_TIMEOUT = 120  # seconds for every till process to get going
+
+
+class _Till:
+    # one HTTP client with its own session cookie
+    def __init__(self, port, email):
+        self.port = port
+        self.email = email
+        self.cookies = {}
+        self.results = []  # (operation, ms, outcome)
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        headers = {"Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items())}
+        if body is not None:
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            response.body = response.read()
+        finally:
+            connection.close()
+        for header in response.headers.get_all("Set-Cookie") or []:
+            for name, morsel in http.cookies.SimpleCookie(header).items():
+                if morsel.value:
+                    self.cookies[name] = morsel.value
+                else:
+                    self.cookies.pop(name, None)
+        return response
+
+    def timed(self, operation, method, path, body=None, ok=(200,)):
+        start = time.perf_counter()
+        try:
+            response = self.request(method, path, body)
+        except (OSError, http.client.HTTPException):
+            self.results.append((operation, (time.perf_counter() - start) * 1000, "error"))
+            return None
+        ms = (time.perf_counter() - start) * 1000
+        location = response.headers.get("Location", "")
+        if operation == "purchase" and (
+            response.status == 200 or location.endswith("/purchases/new")
+        ):
+            # sold out since the form was shown (the form comes back with
+            # an invalid choice) or while selling (redirect back to the form)
+            outcome = "out_of_stock"
+        elif response.status not in ok:
+            outcome = "error"
+        else:
+            outcome = "ok"
+        self.results.append((operation, ms, outcome))
+        if response.status == 302 and outcome != "error":
+            # like a browser: the next page shows (and clears) the flash
+            try:
+                self.request("GET", location)
+            except (OSError, http.client.HTTPException):
+                self.results[-1] = (operation, ms, "error")
+        return response
+
+    def login(self):
+        self.cookies.clear()
+        self.timed(
+            "login",
+            "POST",
+            "/auth/login",
+            urlencode({"email": self.email, "password": "bench"}),
+            ok=(302,),
+        )
+
+
+def _till(port, email, seconds, seed, barrier, results):
+    # runs in its own process until the deadline, then sends its timings
+    rnd = random.Random(seed)
+    operations, weights = zip(*LOAD_MIX)
+    till = _Till(port, email)
+    barrier.wait(timeout=TILL_START_TIMEOUT)  # all start together, after imports
+    start = time.time()
+    till.login()
+    while time.time() - start < seconds:
+        operation = rnd.choices(operations, weights)[0]
+        if operation == "menu":
+            till.timed("menu", "GET", "/menu_items/")
+        elif operation == "purchase":
+            form = till.timed("purchase_form", "GET", "/purchases/new")
+            # a dish the form offers, i.e. one that is still available
+            choices = re.findall(rb'<option value="(\d+)"', form.body) if form else []
+            if choices:
+                till.timed(
+                    "purchase",
+                    "POST",
+                    "/purchases/new",
+                    f"available_menu_items={int(rnd.choice(choices))}",
+                    ok=(302,),
+                )
+        else:
+            till.login()
+    results.put((start, time.time(), till.results))
+
+
+def _collect(processes, results, seconds):
+    # every till's results; a till that dies or hangs fails the run instead
+    # of leaving us waiting forever
+    collected = []
+    # start, the run itself and one last request (HTTP timeout 60 s)
+    deadline = time.monotonic() + TILL_START_TIMEOUT + seconds + 60
+    while len(collected) < len(processes):
+        try:
+            collected.append(results.get(timeout=1))
+        except queue.Empty:
+            crashed = [p.exitcode for p in processes if p.exitcode not in (None, 0)]
+            if crashed:
+                raise RuntimeError(f"{len(crashed)} tills crashed: exit codes {crashed}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(
+                    f"{len(processes) - len(collected)} tills didn't finish in time"
+                )
+    return collected
+
+
+def run(tills=8, seconds=10, size="small", stock=20_000, busy_timeout=None):
+    # `tills` client processes replay LOAD_MIX against a local threaded server
+    # for `seconds`; stock is set low (thousandths per ingredient) so that
+    # concurrent sales run ingredients out while we watch for negative stock
+    from flask import got_request_exception
+    from werkzeug.serving import make_server
+    from . import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        config = {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "WTF_CSRF_ENABLED": False,
+        }
+        if busy_timeout is not None:
+            config["SQLITE_PRAGMAS"] = {"busy_timeout": busy_timeout}
+        app = create_app(config)
+        with app.app_context():
+            seed.generate(**SIZES[size])
+            db.session.execute(update(Ingredient).values(quantity_available_milli=stock))
+            ingredient_ids = list(db.session.scalars(select(Ingredient.id)))
+            mark_changed(db.session, ingredient_ids=ingredient_ids)
+            for n in range(tills):
+                user = User(username=f"till-{n}", email=f"till-{n}@example.com")
+                user.set_password("bench")
+                db.session.add(user)
+            db.session.commit()
+            purchases_before = db.session.scalar(select(func.count(Purchase.id)))
+
+        # server side: failed requests, and which of them were lock timeouts
+        failures = {"errors": 0, "locked": 0}
+
+        def count_failure(sender, exception, **extra):
+            failures["errors"] += 1
+            if isinstance(exception, OperationalError) and "locked" in str(exception):
+                failures["locked"] += 1
+
+        got_request_exception.connect(count_failure, app)
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log
+        app.logger.setLevel(logging.CRITICAL)  # failures are counted instead
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(tills)
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=_till,
+                args=(
+                    server.server_port,
+                    f"till-{n}@example.com",
+                    seconds,
+                    n,
+                    barrier,
+                    results,
+                ),
+            )
+            for n in range(tills)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            collected = _collect(processes, results, seconds)
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            server.shutdown()
+            got_request_exception.disconnect(count_failure, app)
+
+        with app.app_context():
+            negative = db.session.scalar(
+                select(func.count(Ingredient.id)).where(
+                    Ingredient.quantity_available_milli < 0
+                )
+            )
+            purchases = db.session.scalar(select(func.count(Purchase.id)))
+            db.engine.dispose()
+
+    wall_s = max(end for _, end, _ in collected) - min(start for start, _, _ in collected)
+    timings = [timing for _, _, till_results in collected for timing in till_results]
+    operations = {}
+    for operation in ("login", "menu", "purchase_form", "purchase"):
+        rows = [timing for timing in timings if timing[0] == operation]
+        latencies = [ms for _, ms, _ in rows]
+        outcomes = [outcome for _, _, outcome in rows]
+        operations[operation] = {
+            "requests": len(rows),
+            "errors": outcomes.count("error"),
+            "out_of_stock": outcomes.count("out_of_stock"),
+            "p50_ms": round(percentile(latencies, 50) or 0, 1),
+            "p95_ms": round(percentile(latencies, 95) or 0, 1),
+            "p99_ms": round(percentile(latencies, 99) or 0, 1),
+        }
+    requests = len(timings) or 1
+    errors = sum(operation["errors"] for operation in operations.values())
+    sold = operations["purchase"]["requests"] - operations["purchase"]["errors"]
+    sold -= operations["purchase"]["out_of_stock"]
+    return {
+        "tills": tills,
+        "seconds": round(wall_s, 1),
+        "requests": len(timings),
+        "requests_per_s": round(len(timings) / wall_s, 1),
+        "error_rate": round(errors / requests, 4),
+        "server_errors": failures["errors"],
+        "lock_timeouts": failures["locked"],
+        "lock_timeout_rate": round(failures["locked"] / requests, 4),
+        "sold": sold,
+        "purchases_recorded": purchases - purchases_before,
+        "negative_stock": negative,
+        "operations": operations,
+    }
@@ -0,0 +1,75 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from sqlalchemy.exc import OperationalError
+
+from .extensions import db
+from .models import MenuItem, OutOfStock, Purchase
+from .bench import SIZES
+from . import seed
+
+
+# Throughput of the SQLite storage profiles (storage.PROFILES) under
+# concurrent readers and writers, for `flask bench-storage`.
+
+def run(profile, seconds=3, readers=4, writers=2, size="small"):
+    # concurrent readers (menu availability) and writers (sales) against one
+    # SQLite file with the given STORAGE_PROFILE; returns operations per second
+    from . import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+                "STORAGE_PROFILE": profile,
+            }
+        )
+        with app.app_context():
+            seed.generate(**SIZES[size])
+            db.session.commit()
+            menu_item_ids = sorted(MenuItem.available_ids())
+
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def reader():
+            with app.app_context():
+                while time.perf_counter() < deadline:
+                    try:
+                        MenuItem.available_ids()
+                        key = "reads"
+                    except OperationalError:
+                        db.session.rollback()
+                        key = "errors"
+                    with lock:
+                        counts[key] += 1
+
+        def writer(n):
+            rnd = random.Random(n)
+            with app.app_context():
+                while time.perf_counter() < deadline:
+                    menu_item = db.session.get(MenuItem, rnd.choice(menu_item_ids))
+                    try:
+                        menu_item.take_ingredients()
+                        db.session.add(Purchase(menu_item_id=menu_item.id))
+                        db.session.commit()
+                        key = "writes"
+                    except (OperationalError, OutOfStock):
+                        db.session.rollback()
+                        key = "errors"
+                    with lock:
+                        counts[key] += 1
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with app.app_context():
+            db.engine.dispose()
+    return {key: round(value / seconds, 1) for key, value in counts.items()}
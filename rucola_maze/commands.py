@@ -0,0 +1,301 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .extensions import db
+from . import archive, assets, bench, deliveries, queryplans, rollups, seed, storage
+from . import bench_batch, bench_deliveries, bench_events, bench_load, bench_storage
+
+
+rollups_cli = AppGroup("rollups", help="Hourly and daily sales rollups.")
+
+
+@rollups_cli.command("rebuild")
+def rollups_rebuild():
+    """Recount the sales rollups from the purchase table."""
+    rollups.rebuild()
+    db.session.commit()
+    click.echo("Sales rollups rebuilt.")
+
+
+purchases_cli = AppGroup("purchases", help="Purchase maintenance.")
+
+
+@purchases_cli.command("archive")
+@click.option("--days", type=int,
+              help="Archive purchases older than this many days "
+                   "[default: PURCHASE_ARCHIVE_DAYS].")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--pause", default=0.05, show_default=True,
+              help="Seconds between batches, to let sales through.")
+@click.option("--limit", type=int, help="Stop after this many purchases.")
+def purchases_archive(days, batch_size, pause, limit):
+    """Move old purchases to the archive; totals stay the same.
+
+    Safe to interrupt and run again: every batch is its own transaction.
+    """
+    config = dict(current_app.config)
+    if days is not None:
+        config["PURCHASE_ARCHIVE_DAYS"] = days
+    before = archive.cutoff(config)
+    click.echo(f"Archiving purchases before {before:%Y-%m-%d %H:%M}.")
+    moved = archive.archive(
+        before,
+        batch_size,
+        pause,
+        limit,
+        progress=lambda n: click.echo(f"  {n} archived", err=True),
+    )
+    click.echo(f"{moved} purchases archived.")
+
+
+@click.command("seed")
+@click.option("--ingredients", default=100, show_default=True,
+              type=click.IntRange(min=0))
+@click.option("--menu-items", default=50, show_default=True,
+              type=click.IntRange(min=0))
+@click.option("--requirements", default=5, show_default=True,
+              type=click.IntRange(min=0),
+              help="Recipe requirements per menu item.")
+@click.option("--purchases", default=10000, show_default=True,
+              type=click.IntRange(min=0))
+@click.option("--days", default=90, show_default=True, type=click.IntRange(min=1),
+              help="Purchases are spread over this many days.")
+@click.option("--seed", "random_seed", default=0, show_default=True)
+@click.option("--reset", is_flag=True,
+              help="Delete all inventory data (not users) first.")
+def seed_command(
+    ingredients, menu_items, requirements, purchases, days, random_seed, reset
+):
+    """Fill the database with reproducible synthetic data."""
+    if purchases and not menu_items:
+        raise click.BadParameter("purchases need menu items", param_hint="--purchases")
+    if reset:
+        seed.clear()
+    elif seed.has_data():
+        raise click.ClickException(
+            "The database already has inventory data; use --reset to replace it."
+        )
+    seed.generate(ingredients, menu_items, requirements, purchases, days, random_seed)
+    db.session.commit()
+    click.echo(
+        f"Added {ingredients} ingredients, {menu_items} menu items, "
+        f"{menu_items * requirements} recipe requirements, {purchases} purchases."
+    )
+
+
+@click.command("bench")
+@click.option("--sizes", default="small,medium", show_default=True,
+              help="Comma separated: " + ",".join(bench.SIZES))
+@click.option("--repeat", default=5, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False),
+              help="Save results as JSON (e.g. a new baseline).")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False),
+              help="Compare against a saved JSON run.")
+@click.option("--threshold", default=1.5, show_default=True,
+              help="Report targets slower than threshold x baseline.")
+def bench_command(sizes, repeat, output, baseline, threshold):
+    """Benchmark the inventory views and model methods on synthetic data."""
+    results = bench.run(sizes.split(","), repeat)
+    for size, data in results.items():
+        click.echo(f"{size}: {data['params']}")
+        for target, result in data["results"].items():
+            click.echo(
+                f"  {target:40} {result['median_ms']:>10.2f} ms"
+                f" {result['queries']:>7} queries"
+            )
+    if output:
+        bench.save(results, output)
+    if baseline:
+        regressions = bench.compare(results, bench.load(baseline), threshold)
+        for line in regressions:
+            click.echo(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+@click.command("bench-storage")
+@click.option("--seconds", default=3, show_default=True)
+@click.option("--readers", default=4, show_default=True)
+@click.option("--writers", default=2, show_default=True)
+def bench_storage_command(seconds, readers, writers):
+    """Compare concurrent read/write throughput of the storage profiles."""
+    for profile in storage.PROFILES:
+        result = bench_storage.run(profile, seconds, readers, writers)
+        click.echo(
+            f"{profile:8} {result['reads']:>9} reads/s {result['writes']:>8} writes/s"
+            f" {result['errors']:>6} errors/s"
+        )
+
+
+@click.command("bench-events")
+@click.option("--clients", default="1,10,100", show_default=True,
+              help="Comma separated numbers of concurrent streams.")
+@click.option("--writes", default=50, show_default=True)
+@click.option("--interval", default=0.1, show_default=True,
+              help="Seconds between writes.")
+@click.option("--poll", default=0.05, show_default=True,
+              help="STOCK_EVENTS_POLL of the server.")
+def bench_events_command(clients, writes, interval, poll):
+    """Measure stock event latency with many open streams."""
+    for n in clients.split(","):
+        result = bench_events.run(int(n), writes, interval, poll)
+        click.echo(
+            f"{result['clients']:>5} clients  connect {result['connect_ms']:>8} ms"
+            f"  p50 {result['p50_ms']:>7} ms  p95 {result['p95_ms']:>7} ms"
+            f"  p99 {result['p99_ms']:>7} ms  {result['delivered']} delivered,"
+            f" {result['coalesced']} coalesced"
+        )
+
+
+@click.command("bench-batch")
+@click.option("--lines", default=200, show_default=True)
+def bench_batch_command(lines):
+    """Time sales posted one by one against the batch purchase endpoint."""
+    result = bench_batch.run(lines)
+    click.echo(
+        f"{result['lines']} lines: purchase form {result['form_lines_per_s']}"
+        f" lines/s, batch endpoint {result['batch_lines_per_s']} lines/s"
+        f" ({result['accepted']} accepted)"
+    )
+
+
+@click.command("bench-delivery")
+@click.option("--rows", default=10_000, show_default=True)
+def bench_delivery_command(rows):
+    """Time a bulk delivery import against per-line updates."""
+    result = bench_deliveries.run(rows)
+    click.echo(
+        f"{result['rows']} rows ({result['created']} created, {result['updated']}"
+        f" updated) in {result['bulk_s']} s: {result['bulk_rows_per_s']} rows/s,"
+        f" one commit per line: {result['per_line_rows_per_s']} rows/s"
+    )
+
+
+@click.command("bench-load")
+@click.option("--tills", default="1,8,32", show_default=True,
+              help="Comma separated numbers of concurrent client processes.")
+@click.option("--seconds", default=10, show_default=True)
+@click.option("--stock", default=20_000, show_default=True,
+              help="Starting stock of every ingredient, in thousandths.")
+@click.option("--busy-timeout", type=int, help="SQLite busy_timeout in ms.")
+@click.option("--output", type=click.Path(dir_okay=False),
+              help="Save the results as JSON.")
+def bench_load_command(tills, seconds, stock, busy_timeout, output):
+    """Replay logins, menu views and sales from many tills at once."""
+    results = []
+    for n in tills.split(","):
+        try:
+            result = bench_load.run(
+                int(n), seconds, stock=stock, busy_timeout=busy_timeout
+            )
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+        results.append(result)
+        click.echo(
+            f"{result['tills']:>4} tills  {result['requests_per_s']:>7} req/s"
+            f"  errors {result['error_rate']:.2%}"
+            f"  lock timeouts {result['lock_timeout_rate']:.2%}"
+            f"  sold {result['sold']} (recorded {result['purchases_recorded']})"
+        )
+        for name, operation in result["operations"].items():
+            click.echo(
+                f"      {name:14} {operation['requests']:>6}"
+                f"  p50 {operation['p50_ms']:>7} ms  p95 {operation['p95_ms']:>7} ms"
+                f"  p99 {operation['p99_ms']:>7} ms  {operation['errors']} errors"
+                f"  {operation['out_of_stock']} out of stock"
+            )
+    if output:
+        bench.save(results, output)
+    broken = [result for result in results if result["negative_stock"]]
+    for result in broken:
+        click.echo(
+            f"NEGATIVE STOCK with {result['tills']} tills:"
+            f" {result['negative_stock']} ingredients"
+        )
+    if broken:
+        raise SystemExit(1)
+
+
+@click.command("import-delivery")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--verbose", is_flag=True, help="Print the result of every line.")
+def import_delivery_command(path, verbose):
+    """Add a delivery (CSV or JSON file) to the ingredient stock."""
+    with open(path, "rb") as f:
+        try:
+            lines = deliveries.read(f.read(), path)
+        except (UnicodeDecodeError, ValueError) as e:
+            raise click.ClickException(str(e))
+    results = deliveries.import_lines(lines)
+    db.session.commit()
+    for result in results:
+        if verbose or result["status"] == "error":
+            click.echo(
+                f"line {result['line'] + 1}: {result.get('name', '')}"
+                f" {result['status']} {result.get('error', '')}".rstrip()
+            )
+    counts = deliveries.summary(results)
+    click.echo(
+        f"{counts['created']} created, {counts['updated']} updated,"
+        f" {counts['error']} errors."
+    )
+
+
+@click.command("explain")
+@click.option("--verbose", is_flag=True, help="Print every plan, not only failures.")
+def explain_command(verbose):
+    """Check that the key queries use indexes (EXPLAIN QUERY PLAN)."""
+    failures = 0
+    for label, details, problems in queryplans.check():
+        if problems:
+            failures += 1
+        if problems or verbose:
+            click.echo(f"{label}: {', '.join(problems) or 'ok'}")
+            for detail in details:
+                click.echo(f"    {detail}")
+    if failures:
+        raise click.ClickException(f"{failures} queries don't use indexes.")
+    click.echo("All key queries use indexes.")
+
+
+assets_cli = AppGroup("assets", help="Vendored and fingerprinted static files.")
+
+
+@assets_cli.command("vendor")
+def assets_vendor():
+    """Download the CDN stylesheets and fonts into static/vendor."""
+    for name in assets.vendor(current_app.static_folder):
+        click.echo(f"static/{name}")
+
+
+@assets_cli.command("build")
+def assets_build():
+    """Write hashed and precompressed copies of static files to static/dist."""
+    missing = assets.missing_vendor_files(current_app.static_folder)
+    if missing and not current_app.config["ASSETS_CDN_FALLBACK"]:
+        raise click.ClickException(
+            f"Missing {', '.join(missing)}; run 'flask assets vendor' first."
+        )
+    manifest = assets.build(current_app.static_folder)
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f"{name} -> {assets.DIST}/{hashed}")
+    for name in sorted(missing):
+        click.echo(f"{name} is not vendored, pages load it from its CDN.")
+    if assets.brotli is None:
+        click.echo("brotli is not installed, only .gz variants were written.")
+
+
+def init_app(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(purchases_cli)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(bench_command)
+    app.cli.add_command(bench_storage_command)
+    app.cli.add_command(bench_events_command)
+    app.cli.add_command(bench_batch_command)
+    app.cli.add_command(bench_delivery_command)
+    app.cli.add_command(bench_load_command)
+    app.cli.add_command(import_delivery_command)
+    app.cli.add_command(explain_command)
+    app.cli.add_command(assets_cli)
@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .extensions import db
+from .models import Ingredient, to_milli
+from .availability import mark_changed
+
+
+# Bulk delivery import: adds the delivered quantities to the ingredients and,
+# where a line has one, sets the new unit price. Unknown ingredients are
+# created. Lines are upserted in batches with
+# INSERT ... ON CONFLICT(name) DO UPDATE over the unique ingredient name, all
+# in the caller's transaction; every line gets its own result.
+#
+# CSV (comma or semicolon separated) with a header, or JSON, a list of lines
+# or {"lines": [...]}:
+#   name,quantity,unit,unit_price
+#   Мука,12.5,кг,45.90
+# quantity in the ingredient's unit, unit_price in rubles per unit; unit is
+# needed for new ingredients, unit_price is optional.
+
+BATCH_SIZE = 500
+FIELDS = ["name", "quantity", "unit", "unit_price"]
+# far above any real delivery, far below SQLite's 64-bit INTEGER
+MAX_QUANTITY = 10**9  # units of one ingredient, also after adding up lines
+MAX_UNIT_PRICE = 10**9  # rubles
+
+
+def read(data, filename=""):
+    # bytes or str of an uploaded / given file -> list of lines (dicts)
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    if filename.lower().endswith(".json") or data.lstrip()[:1] in ("[", "{"):
+        try:
+            lines = json.loads(data)
+        except ValueError:
+            raise ValueError("файл не является корректным JSON")
+        if isinstance(lines, dict):
+            lines = lines.get("lines")
+        if not isinstance(lines, list):
+            raise ValueError("ожидается список позиций 'lines'")
+        return lines
+    try:
+        dialect = csv.Sniffer().sniff(data[:4096].split("\n")[0], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(data), dialect=dialect)
+    if not reader.fieldnames or "name" not in reader.fieldnames:
+        raise ValueError("в первой строке нужны заголовки: " + ",".join(FIELDS))
+    return list(reader)
+
+
+def _number(value, field, maximum):
+    try:
+        number = Decimal(str(value).strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"{field} должно быть числом")
+    if not number.is_finite() or number < 0:
+        raise ValueError(f"{field} должно быть неотрицательным числом")
+    if number > maximum:
+        raise ValueError(f"{field} не может быть больше {maximum}")
+    return number
+
+
+def parse_line(line):
+    # -> (name, quantity_milli, unit or None, unit_price in cents or None)
+    if not isinstance(line, dict):
+        raise ValueError("позиция должна быть объектом")
+    name = str(line.get("name") or "").strip()
+    if not name:
+        raise ValueError("нужно название ингредиента")
+    if line.get("quantity") in (None, ""):
+        raise ValueError("нужно количество")
+    quantity = to_milli(_number(line["quantity"], "количество", MAX_QUANTITY))
+    unit = str(line.get("unit") or "").strip() or None
+    unit_price = None
+    if line.get("unit_price") not in (None, ""):
+        cents = _number(line["unit_price"], "цена", MAX_UNIT_PRICE) * 100
+        if cents != cents.to_integral_value():
+            raise ValueError("в цене не больше двух знаков после запятой")
+        unit_price = int(cents)
+    return name, quantity, unit, unit_price
+
+
+def import_lines(lines):
+    results = [None] * len(lines)
+    parsed = []
+    for i, line in enumerate(lines):
+        try:
+            parsed.append((i,) + parse_line(line))
+        except ValueError as e:
+            results[i] = {"line": i, "status": "error", "error": str(e)}
+
+    names = list({name for _, name, _, _, _ in parsed})
+    units = {}
+    for chunk in _chunks(names):
+        units.update(
+            db.session.execute(
+                select(Ingredient.name, Ingredient.unit).where(Ingredient.name.in_(chunk))
+            ).all()
+        )
+
+    # one row per ingredient: quantities of repeated lines add up, the last
+    # price given wins
+    delivered = {}
+    for i, name, quantity, unit, unit_price in parsed:
+        known = name in units or name in delivered
+        stored_unit = units.get(name) or (delivered.get(name) or {}).get("unit")
+        total = (delivered.get(name) or {}).get("quantity_available_milli", 0)
+        if not known and not unit:
+            error = "для нового ингредиента нужна единица измерения"
+        elif known and unit and stored_unit and unit != stored_unit:
+            error = f"единица измерения '{unit}' не совпадает с '{stored_unit}'"
+        elif total + quantity > MAX_QUANTITY * 1000:
+            error = f"всего в поставке больше {MAX_QUANTITY}"
+        else:
+            error = None
+        if error:
+            results[i] = {"line": i, "name": name, "status": "error", "error": error}
+            continue
+        row = delivered.setdefault(
+            name,
+            {"name": name, "quantity_available_milli": 0, "unit": unit, "unit_price": None},
+        )
+        row["quantity_available_milli"] += quantity
+        if unit_price is not None:
+            row["unit_price"] = unit_price
+        # a new ingredient named on several lines is created by all of them
+        results[i] = {
+            "line": i,
+            "name": name,
+            "status": "updated" if name in units else "created",
+        }
+
+    with_price = [row for row in delivered.values() if row["unit_price"] is not None]
+    without_price = [row for row in delivered.values() if row["unit_price"] is None]
+    for rows, set_price in ((with_price, True), (without_price, False)):
+        stmt = _upsert(set_price)
+        for chunk in _chunks(rows):
+            db.session.execute(
+                stmt, [{**row, "unit_price": row["unit_price"] or 0} for row in chunk]
+            )
+
+    ids = []
+    for chunk in _chunks(list(delivered)):
+        ids += db.session.scalars(select(Ingredient.id).where(Ingredient.name.in_(chunk)))
+    mark_changed(db.session, ingredient_ids=ids)
+    return results
+
+
+def _upsert(set_price):
+    # executed with a list of rows (executemany): compiled once, not per batch
+    stmt = sqlite_insert(Ingredient)
+    set_ = {
+        "quantity_available_milli": func.coalesce(Ingredient.quantity_available_milli, 0)
+        + stmt.excluded.quantity_available_milli
+    }
+    if set_price:
+        set_["unit_price"] = stmt.excluded.unit_price
+    return stmt.on_conflict_do_update(index_elements=[Ingredient.name], set_=set_)
+
+
+def _chunks(items):
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start : start + BATCH_SIZE]
+
+
+def summary(results):
+    counts = {"created": 0, "updated": 0, "error": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return counts
@@ -0,0 +1,136 @@
+import csv
+import io
+import json
+from flask import Blueprint, Response, request, stream_with_context
+from flask_login import login_required
+from sqlalchemy import select, union_all
+
+from .extensions import db
+from .models import Ingredient, MenuItem, Purchase, PurchaseArchive, from_milli
+from .inventory import date_range_from_args
+
+
+# Exports stream rows straight from a server-side cursor (yield_per), so memory
+# use stays flat no matter how many purchases there are.
+
+bp = Blueprint("export", __name__, url_prefix="/export")
+
+YIELD_PER = 1000
+
+
+@bp.route("/purchases.<any(csv, ndjson):fmt>")
+@login_required
+def purchases(fmt):
+    start, end = date_range_from_args(request.args)
+    # live and archived purchases (archive.py), as rollups.rebuild() counts them
+    live = select(Purchase.id, Purchase.time, Purchase.menu_item_id)
+    archived = select(
+        PurchaseArchive.purchase_id, PurchaseArchive.time, PurchaseArchive.menu_item_id
+    )
+    if start is not None:
+        live = live.where(Purchase.time >= start)
+        archived = archived.where(PurchaseArchive.time >= start)
+    if end is not None:
+        live = live.where(Purchase.time < end)
+        archived = archived.where(PurchaseArchive.time < end)
+    sales = union_all(live, archived).subquery()
+    query = (
+        select(
+            sales.c.id,
+            sales.c.time,
+            MenuItem.id.label("menu_item_id"),
+            MenuItem.title,
+            MenuItem.price,
+        )
+        .join(MenuItem, sales.c.menu_item_id == MenuItem.id)
+        .order_by(sales.c.time, sales.c.id)
+    )
+
+    def rows():
+        for row in _stream(query):
+            yield {
+                "id": row.id,
+                "time": _time(row.time),
+                "menu_item_id": row.menu_item_id,
+                "menu_item": row.title,
+                "price": _money(row.price),
+            }
+
+    fields = ["id", "time", "menu_item_id", "menu_item", "price"]
+    return _response(rows(), fields, fmt, "purchases")
+
+
+@bp.route("/ingredients.<any(csv, ndjson):fmt>")
+@login_required
+def ingredients(fmt):
+    query = select(
+        Ingredient.id,
+        Ingredient.name,
+        Ingredient.quantity_available_milli,
+        Ingredient.unit,
+        Ingredient.unit_price,
+    ).order_by(Ingredient.name)
+
+    def rows():
+        for row in _stream(query):
+            yield {
+                "id": row.id,
+                "name": row.name,
+                "quantity_available": str(
+                    from_milli(row.quantity_available_milli)
+                ),
+                "unit": row.unit,
+                "unit_price": _money(row.unit_price),
+            }
+
+    fields = ["id", "name", "quantity_available", "unit", "unit_price"]
+    return _response(rows(), fields, fmt, "ingredients")
+
+
+def _stream(query):
+    result = db.session.execute(query.execution_options(yield_per=YIELD_PER))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+
+def _money(cents):
+    if cents is None:
+        return None
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def _time(value):
+    if value is None:
+        return None
+    return value.isoformat(sep=" ", timespec="seconds")
+
+
+def _response(rows, fields, fmt, name):
+    if fmt == "csv":
+        body = _csv_lines(rows, fields)
+        mimetype = "text/csv"
+    else:
+        body = (json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        mimetype = "application/x-ndjson"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={name}.{fmt}"},
+    )
+
+
+def _csv_lines(rows, fields, chunk_size=64 * 1024):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        # hand out the buffer in chunks so it never grows past chunk_size
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -1,16 +1,32 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import (
+    Form,
     StringField,
     IntegerField,
+    DecimalField,
     SubmitField,
     DateTimeField,
     BooleanField,
     PasswordField,
+    FieldList,
+    FormField,
+    SelectField,
+    ValidationError,
 )
 from wtforms_sqlalchemy.fields import QuerySelectField
-from wtforms.validators import DataRequired, Email, EqualTo, InputRequired
+from wtforms.validators import (
+    DataRequired,
+    Email,
+    EqualTo,
+    InputRequired,
+    NumberRange,
+    Optional,
+    StopValidation,
+)
 
 from .models import *
+from .deliveries import MAX_QUANTITY, MAX_UNIT_PRICE
 
 
 class RegistrationForm(FlaskForm):
@@ -23,6 +39,28 @@ class RegistrationForm(FlaskForm):
     remember = BooleanField("Запомнить")
 
 
+NEGATIVE_PRICE = "цена не может быть отрицательной."
+
+
+def finite(form, field):
+    # Decimal accepts "Infinity" and "NaN", which can't be stored (and NaN
+    # can't even be compared by NumberRange)
+    if field.data is not None and not field.data.is_finite():
+        raise StopValidation("Введите число.")
+
+
+def quantity_range():
+    return NumberRange(
+        min=0, max=MAX_QUANTITY, message=f"количество должно быть от 0 до {MAX_QUANTITY}."
+    )
+
+
+def price_range():
+    return NumberRange(
+        max=MAX_UNIT_PRICE, message=f"цена не может быть больше {MAX_UNIT_PRICE}."
+    )
+
+
 class LoginForm(FlaskForm):
     email = StringField("Имейл", validators=[DataRequired(), Email()])
     password = PasswordField("Пароль", validators=[DataRequired()])
@@ -31,30 +69,88 @@ class LoginForm(FlaskForm):
 
 class IngredientForm(FlaskForm):
     name = StringField("Название ингредиента", validators=[DataRequired()])
-    quantity_available = StringField("Доступное количество", validators=[DataRequired()])
+    quantity_available = DecimalField(
+        "Доступное количество",
+        places=None,
+        validators=[InputRequired(), finite, quantity_range()],
+    )
     unit = StringField("Единица измерения", validators=[DataRequired()], default="кг")
     unit_price_dollars = IntegerField(
-        "Цена за единицу: рубли", validators=[InputRequired()], default=0
+        "Цена за единицу: рубли",
+        validators=[
+            InputRequired(),
+            NumberRange(min=0, message=NEGATIVE_PRICE),
+            price_range(),
+        ],
+        default=0,
+    )
+    unit_price_cents = IntegerField(
+        "коп.", validators=[InputRequired(), NumberRange(min=0, max=99)], default=0
     )
-    unit_price_cents = StringField("коп.", validators=[DataRequired()], default="00")
     submit = SubmitField("Сохранить")
 
 
+class DeliveryForm(FlaskForm):
+    file = FileField(
+        "Файл поставки (CSV или JSON)",
+        validators=[FileRequired(), FileAllowed(["csv", "json", "txt"])],
+    )
+    submit = SubmitField("Загрузить")
+
+
 class MenuItemForm(FlaskForm):
     title = StringField("Название", validators=[DataRequired()])
-    price_dollars = IntegerField("Цена, руб.:", validators=[InputRequired()])
-    price_cents = StringField("коп.", validators=[DataRequired()], default="00")
+    price_dollars = IntegerField(
+        "Цена, руб.:",
+        validators=[
+            InputRequired(),
+            NumberRange(min=0, message=NEGATIVE_PRICE),
+            price_range(),
+        ],
+    )
+    price_cents = IntegerField(
+        "коп.", validators=[InputRequired(), NumberRange(min=0, max=99)], default=0
+    )
     submit = SubmitField("Сохранить")
 
 
 class RecipeRequirementForm(FlaskForm):  # INCLUDE ONLY AVAILABLE ITEMS
-    quantity_required = StringField("Требуемое количество", validators=[DataRequired()])
+    quantity_required = DecimalField(
+        "Требуемое количество",
+        places=None,
+        validators=[InputRequired(), finite, quantity_range()],
+    )
     all_ingredients_possible = QuerySelectField(label="Ингредиент", allow_blank=False)
     all_menu_items_possible = QuerySelectField(label="Ингредиент", allow_blank=False)
 
     submit = SubmitField("Сохранить")
 
 
+class RecipeLineForm(Form):
+    ingredient = SelectField("Ингредиент", coerce=int, default=0)
+    quantity_required = DecimalField(
+        "Требуемое количество",
+        places=None,
+        validators=[Optional(), finite, quantity_range()],
+    )
+
+    def validate_quantity_required(form, field):
+        if form.ingredient.data and field.data is None:
+            raise ValidationError("Укажите количество")
+
+
+class RecipeForm(FlaskForm):
+    BLANK_LINES = 5  # empty lines offered for new ingredients
+
+    lines = FieldList(FormField(RecipeLineForm))
+    submit = SubmitField("Сохранить")
+
+    def validate_lines(form, field):
+        ingredient_ids = [line.ingredient.data for line in field if line.ingredient.data]
+        if len(ingredient_ids) != len(set(ingredient_ids)):
+            raise ValidationError("Каждый ингредиент можно указать только один раз")
+
+
 class PurchaseForm(FlaskForm):
     available_menu_items = QuerySelectField(label="Блюдо", allow_blank=False)
     submit = SubmitField("Сохранить")
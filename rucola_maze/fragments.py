@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+from flask import current_app, request
+from markupsafe import Markup
+
+from . import versions
+
+
+# Cache of rendered HTML fragments (table bodies of the list pages).
+# The key holds the versions of the tables a fragment shows, so any write makes
+# old entries unreachable and they simply age out of the LRU; nothing has to
+# be invalidated and several processes can't serve each other stale HTML.
+# On a hit the view skips both its queries and the Jinja work.
+# FRAGMENT_CACHE = False turns it off; in debug mode ?nocache=1 bypasses it
+# for a single request.
+
+
+class _State:
+    def __init__(self, max_bytes):
+        self.lock = threading.Lock()
+        self.fragments = OrderedDict()  # key -> (html, size)
+        self.bytes = 0
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+
+class FragmentCache:
+    def init_app(self, app):
+        app.config.setdefault("FRAGMENT_CACHE", True)
+        app.config.setdefault("FRAGMENT_CACHE_MAX_BYTES", 8 * 1024 * 1024)
+        app.extensions["fragment_cache"] = _State(
+            app.config["FRAGMENT_CACHE_MAX_BYTES"]
+        )
+
+    def _state(self):
+        return current_app.extensions["fragment_cache"]
+
+    def _bypass(self):
+        return not current_app.config["FRAGMENT_CACHE"] or (
+            current_app.debug and "nocache" in request.args
+        )
+
+    def render(self, name, tables, render):
+        # render() builds the fragment (queries + template) on a miss
+        if self._bypass():
+            return Markup(render())
+        current = versions.current(tables)
+        key = (name, request.full_path) + tuple(
+            (table, current.get(table, 0)) for table in sorted(tables)
+        )
+        state = self._state()
+        with state.lock:
+            if key in state.fragments:
+                state.fragments.move_to_end(key)
+                state.hits += 1
+                return Markup(state.fragments[key][0])
+            state.misses += 1
+
+        html = render()
+        size = len(html.encode())
+        with state.lock:
+            if size <= state.max_bytes and key not in state.fragments:
+                state.fragments[key] = (html, size)
+                state.bytes += size
+                while state.bytes > state.max_bytes:
+                    _, (_, old_size) = state.fragments.popitem(last=False)
+                    state.bytes -= old_size
+        return Markup(html)
+
+    def clear(self):
+        state = self._state()
+        with state.lock:
+            state.fragments.clear()
+            state.bytes = 0
+
+    def stats(self):
+        state = self._state()
+        with state.lock:
+            return {
+                "enabled": current_app.config["FRAGMENT_CACHE"],
+                "fragments": len(state.fragments),
+                "bytes": state.bytes,
+                "hits": state.hits,
+                "misses": state.misses,
+            }
+
+
+fragment_cache = FragmentCache()
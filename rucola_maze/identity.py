@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from .extensions import db, login_manager
+from .models import User
+
+
+# Flask-Login calls load_user() on every authenticated request. User rows
+# hardly ever change, so we keep small detached copies of them in a bounded
+# LRU cache with a TTL instead of querying the database each time.
+# A commit that changes or deletes a user evicts it in this process; other
+# processes pick the change up when their entry expires (USER_CACHE_TTL).
+
+
+class CachedUser(UserMixin):
+    # what request handling needs from a user, without a database session
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.joined_at = user.joined_at
+
+    def __str__(self):
+        return f"{self.username}"
+
+
+class _State:
+    def __init__(self, size, ttl):
+        self.lock = threading.Lock()
+        self.users = OrderedDict()  # id -> (expires_at, CachedUser)
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class IdentityCache:
+    def init_app(self, app):
+        app.config.setdefault("USER_CACHE", True)
+        app.config.setdefault("USER_CACHE_SIZE", 1024)
+        app.config.setdefault("USER_CACHE_TTL", 300)  # seconds
+        app.extensions["identity_cache"] = _State(
+            app.config["USER_CACHE_SIZE"], app.config["USER_CACHE_TTL"]
+        )
+
+    def _state(self):
+        return current_app.extensions["identity_cache"]
+
+    def get(self, user_id):
+        if not current_app.config["USER_CACHE"]:
+            return db.session.get(User, user_id)
+        state = self._state()
+        now = time.monotonic()
+        with state.lock:
+            entry = state.users.get(user_id)
+            if entry and entry[0] > now:
+                state.users.move_to_end(user_id)
+                state.hits += 1
+                return entry[1]
+            state.misses += 1
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        cached = CachedUser(user)
+        with state.lock:
+            state.users[user_id] = (now + state.ttl, cached)
+            state.users.move_to_end(user_id)
+            while len(state.users) > state.size:
+                state.users.popitem(last=False)
+                state.evictions += 1
+        return cached
+
+    def invalidate(self, user_ids):
+        state = self._state()
+        with state.lock:
+            for user_id in user_ids:
+                state.users.pop(user_id, None)
+
+    def clear(self):
+        state = self._state()
+        with state.lock:
+            state.users.clear()
+
+    def stats(self):
+        state = self._state()
+        with state.lock:
+            lookups = state.hits + state.misses
+            return {
+                "enabled": current_app.config["USER_CACHE"],
+                "size": len(state.users),
+                "hits": state.hits,
+                "misses": state.misses,
+                "evictions": state.evictions,
+                "hit_rate": state.hits / lookups if lookups else None,
+            }
+
+
+identity_cache = IdentityCache()
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    return identity_cache.get(int(user_id))
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault("identity_changed", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _evict_changed_users(session):
+    changed = session.info.pop("identity_changed", None)
+    if changed and has_app_context():
+        identity_cache.invalidate(changed)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("identity_changed", None)
@@ -11,36 +11,64 @@ from .models import *
 from . import auth
 
 from .extensions import db
-from .forms import IngredientForm, MenuItemForm, RecipeRequirementForm, PurchaseForm
+from .availability import availability_cache, mark_changed
+from .pagination import keyset_paginate
+from .versions import conditional
+from .fragments import fragment_cache
+from . import deliveries, planner, rollups
+from .forms import (
+    DeliveryForm,
+    IngredientForm,
+    MenuItemForm,
+    RecipeForm,
+    RecipeRequirementForm,
+    PurchaseForm,
+)
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from sqlalchemy import select
 from sqlalchemy.sql import func
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 from flask_login import login_required  # login_user, logout_user, current_user
 
 bp = Blueprint("inventory", __name__)
 
 
+def date_range_from_args(args):
+    # "from" and "to" query parameters as YYYY-MM-DD, both days included
+    start = args.get("from", type=date.fromisoformat)
+    end = args.get("to", type=date.fromisoformat)
+    start = datetime.combine(start, time.min) if start else None
+    try:
+        end = datetime.combine(end + timedelta(days=1), time.min) if end else None
+    except OverflowError:  # to=9999-12-31: nothing is later anyway
+        end = None
+    return start, end
+
+
 @bp.route("/")
 @login_required
 def home():
-    # Count revenue
-
-    revenue_cents = 0
-    for p in Purchase.query.all():
-        menu_item_price_cents = (
-            p.menu_item.price_dollars * 100 + p.menu_item.price_cents
+    start, end = date_range_from_args(request.args)
+    report = None
+    if start is None and end is None:
+        # Count revenue
+        revenue_cents = Purchase.revenue_cents()
+
+        # Total cost of all purchases (sum of cost of all ingredients used)
+        cost_of_ingredients_cents = Purchase.cost_of_ingredients_cents()
+    else:
+        # a date range is read from the rollups only, hour by hour for one day
+        granularity = "day"
+        if start and end and end - start <= timedelta(days=1):
+            granularity = "hour"
+        report = rollups.report(start, end, granularity)
+        revenue_cents = sum(row.revenue_cents for row in report)
+        cost_of_ingredients_cents = from_milli(
+            sum(row.cost_of_ingredients_milli_cents for row in report)
         )
-        revenue_cents += menu_item_price_cents
 
-    # Total cost of all purchases (sum of cost of all ingredients used)
-    cost_of_ingredients_cents = 0
-
-    for p in Purchase.query.all():
-        for rr in p.menu_item.in_recipe_requirements.all():
-            unit_price_cents = (
-                rr.ingredient.unit_price_dollars * 100 + rr.ingredient.unit_price_cents
-            )
-            cost_of_ingredients_cents += unit_price_cents * rr.quantity_required
-
-    revenue = revenue_cents / 100
+    revenue = Decimal(revenue_cents) / 100
     cost_of_ingredients = cost_of_ingredients_cents / 100
     profit = revenue - cost_of_ingredients
 
@@ -49,14 +77,19 @@ def home():
         cost_of_ingredients=cost_of_ingredients,
         revenue=revenue,
         profit=profit,
+        report=report,
+        granularity=report is not None and granularity,
     )
 
 
 @bp.route("/ingredients/")
 @login_required
+@conditional("ingredient")
 def ingredients():
-    ingredients = Ingredient.query.order_by(Ingredient.name)
-    return render_template("inventory/ingredients.html", ingredients=ingredients)
+    ingredients = keyset_paginate(Ingredient.query, [Ingredient.name, Ingredient.id])
+    return render_template(
+        "inventory/ingredients.html", ingredients=ingredients, page=ingredients
+    )
 
 
 @bp.route("/ingredients/new", methods=["GET", "POST"])
@@ -68,15 +101,16 @@ def ingredient_new():
             name=form.name.data,
             quantity_available=form.quantity_available.data,
             unit=form.unit.data,
-            unit_price_dollars=form.unit_price_dollars.data,
-            unit_price_cents=form.unit_price_cents.data,
+            unit_price=to_cents(
+                form.unit_price_dollars.data, form.unit_price_cents.data
+            ),
         )
         db.session.add(ingredient)
 
         try:
             db.session.commit()
             flash(
-                f"Вы добавили ингредиент '{ingredient}', ${ingredient.unit_price_dollars}.{ingredient.unit_price_cents} за {ingredient.unit}!"
+                f"Вы добавили ингредиент '{ingredient}', {ingredient.unit_price_dollars}.{ingredient.unit_price_cents:02d} руб. за {ingredient.unit}!"
             )
         except:
             db.session.rollback()
@@ -92,6 +126,30 @@ def ingredient_new():
     return render_template("inventory/ingredient_new.html", form=form)
 
 
+@bp.route("/ingredients/delivery", methods=["GET", "POST"])
+@login_required
+def ingredient_delivery():
+    form = DeliveryForm()
+    results = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            lines = deliveries.read(upload.read(), upload.filename)
+        except (UnicodeDecodeError, ValueError) as e:
+            flash(f"Не удалось прочитать файл: {e}")
+            return render_template("inventory/ingredient_delivery.html", form=form)
+        results = deliveries.import_lines(lines)
+        db.session.commit()
+        counts = deliveries.summary(results)
+        flash(
+            f"Поставка загружена: {counts['created']} новых ингредиентов, "
+            f"{counts['updated']} обновлено, {counts['error']} строк с ошибками."
+        )
+    return render_template(
+        "inventory/ingredient_delivery.html", form=form, results=results
+    )
+
+
 @bp.route("/ingredients/<int:ingredient_id>/edit", methods=["GET", "POST"])
 @login_required
 def ingredient_edit(ingredient_id):
@@ -101,18 +159,20 @@ def ingredient_edit(ingredient_id):
         ingredient.name = form.name.data
         ingredient.quantity_available = form.quantity_available.data
         ingredient.unit = form.unit.data
-        ingredient.unit_price_dollars = form.unit_price_dollars.data
-        ingredient.unit_price_cents = form.unit_price_cents.data
+        ingredient.unit_price = to_cents(
+            form.unit_price_dollars.data, form.unit_price_cents.data
+        )
         try:
             db.session.commit()
             flash(
-                f"Вы отредактировали инредиент '{ingredient}', {ingredient.unit_price_dollars}.{ingredient.unit_price_cents} руб. за {ingredient.unit}!"
+                f"Вы отредактировали инредиент '{ingredient}', {ingredient.unit_price_dollars}.{ingredient.unit_price_cents:02d} руб. за {ingredient.unit}!"
             )
             return redirect(url_for("inventory.ingredients"))
         except:
             flash(f"Ингредиент '{form.name.data}' уже существует! Хотите отредактировать его?")
             db.session.rollback()
-    form = IngredientForm(obj=ingredient)
+    if request.method == "GET":
+        form = IngredientForm(obj=ingredient)
     return render_template(
         "inventory/ingredient_edit.html",
         form=form,
@@ -135,14 +195,29 @@ def ingredient_delete(ingredient_id):
 
 @bp.route("/menu_items/")
 @login_required
+@conditional("menu_item", "recipe_requirement", "ingredient")
 def menu_items():
-    menu_items = MenuItem.query.order_by(MenuItem.title)
-    available_menu_items = [m for m in MenuItem.query.all() if m.is_available()]
-    return render_template(
-        "inventory/menu_items.html",
-        menu_items=menu_items,
-        available_menu_items=available_menu_items,
+    def render_table():
+        menu_items = keyset_paginate(
+            MenuItem.query.options(
+                selectinload(MenuItem.in_recipe_requirements).joinedload(
+                    RecipeRequirement.ingredient
+                )
+            ),
+            [MenuItem.title, MenuItem.id],
+        )
+        available_menu_item_ids = availability_cache.available_ids()
+        return render_template(
+            "inventory/_menu_items_table.html",
+            menu_items=menu_items,
+            page=menu_items,
+            available_menu_item_ids=available_menu_item_ids,
+        )
+
+    table = fragment_cache.render(
+        "menu_items", ("menu_item", "recipe_requirement", "ingredient"), render_table
     )
+    return render_template("inventory/menu_items.html", table=table)
 
 
 @bp.route("/menu_items/new", methods=["GET", "POST"])
@@ -153,14 +228,13 @@ def menu_item_new():
     if form.validate_on_submit():
         menu_item = MenuItem(
             title=form.title.data,
-            price_dollars=form.price_dollars.data,
-            price_cents=form.price_cents.data,
+            price=to_cents(form.price_dollars.data, form.price_cents.data),
         )
         db.session.add(menu_item)
         try:
             db.session.commit()
             flash(
-                f"Вы отредактировали блюдо '{menu_item}', стоимость: {menu_item.price_dollars}.{menu_item.price_cents} руб."
+                f"Вы добавили блюдо '{menu_item}', стоимость: {menu_item.price_dollars}.{menu_item.price_cents:02d} руб."
             )
         except:
             db.session.rollback()
@@ -180,19 +254,20 @@ def menu_item_edit(menu_item_id):
     if form.validate_on_submit():
         try:
             menu_item.title = form.title.data
-            menu_item.price_dollars = form.price_dollars.data
-            menu_item.price_cents = form.price_cents.data
+            menu_item.price = to_cents(form.price_dollars.data, form.price_cents.data)
             db.session.commit()
             flash(
-                f"Вы отредактировали блюдо '{menu_item}, стоимость: {menu_item.price_dollars}.{menu_item.price_cents} руб."
+                f"Вы отредактировали блюдо '{menu_item}, стоимость: {menu_item.price_dollars}.{menu_item.price_cents:02d} руб."
             )
             return redirect(url_for("inventory.menu_items"))
         except:
             flash(f"Блюдо '{form.title.data}' уже существует!")
             db.session.rollback()
+    if request.method == "GET":
+        form = MenuItemForm(obj=menu_item)
     return render_template(
         "inventory/menu_item_edit.html",
-        form=MenuItemForm(obj=menu_item),
+        form=form,
         menu_item=menu_item,
     )
 
@@ -212,16 +287,31 @@ def menu_item_delete(menu_item_id):
 
 @bp.route("/recipe_requirements/")
 @login_required
+@conditional("recipe_requirement", "menu_item", "ingredient")
 def recipe_requirements():
-    recipe_requirements = (
-        db.session.query(RecipeRequirement)
-        .join(RecipeRequirement.menu_item)
-        .order_by(MenuItem.title)
-    )
+    def render_table():
+        recipe_requirements = keyset_paginate(
+            db.session.query(RecipeRequirement)
+            .join(RecipeRequirement.menu_item)
+            .options(
+                contains_eager(RecipeRequirement.menu_item),
+                joinedload(RecipeRequirement.ingredient),
+            ),
+            [MenuItem.title, RecipeRequirement.id],
+            key=lambda rr: [rr.menu_item.title, rr.id],
+        )
+        return render_template(
+            "inventory/_recipe_requirements_table.html",
+            recipe_requirements=recipe_requirements,
+            page=recipe_requirements,
+        )
 
-    return render_template(
-        "inventory/recipe_requirements.html", recipe_requirements=recipe_requirements
+    table = fragment_cache.render(
+        "recipe_requirements",
+        ("recipe_requirement", "menu_item", "ingredient"),
+        render_table,
     )
+    return render_template("inventory/recipe_requirements.html", table=table)
 
 
 @bp.route("/recipe_requirements/new", methods=["GET", "POST"])
@@ -233,18 +323,14 @@ def recipe_requirement_new():
     if form.validate_on_submit():
         ingredient = form.all_ingredients_possible.data
         menu_item = form.all_menu_items_possible.data
-        # Check if recipe req. with the same ingred/menu item pair already exists
-        if not RecipeRequirement.query.filter(
-            RecipeRequirement.menu_item_id == menu_item.id,
-            RecipeRequirement.ingredient_id == ingredient.id,
-        ).all():
-            recipe_requirement = RecipeRequirement(
-                quantity_required=form.quantity_required.data,
-                ingredient_id=ingredient.id,
-                menu_item_id=menu_item.id,
-            )
-            db.session.add(recipe_requirement)
+        # the unique (menu item, ingredient) index rejects an existing pair
+        recipe_requirement_id = RecipeRequirement.add(
+            menu_item.id, ingredient.id, to_milli(form.quantity_required.data)
+        )
+        if recipe_requirement_id is not None:
+            mark_changed(db.session, menu_item_ids=[menu_item.id])
             db.session.commit()
+            recipe_requirement = db.session.get(RecipeRequirement, recipe_requirement_id)
             flash(
                 f"Вы добавили требование рецепта для блюда: {menu_item} ({recipe_requirement})."
             )
@@ -256,6 +342,60 @@ def recipe_requirement_new():
     return render_template("inventory/recipe_requirement_new.html", form=form)
 
 
+@bp.route("/menu_items/<int:menu_item_id>/recipe", methods=["GET", "POST"])
+@login_required
+def menu_item_recipe(menu_item_id):
+    # the whole recipe of a dish on one form, saved in one transaction
+    menu_item = db.get_or_404(MenuItem, menu_item_id)
+    choices = [(0, "—")] + [
+        (id, f"{name}, {unit}")
+        for id, name, unit in db.session.execute(
+            select(Ingredient.id, Ingredient.name, Ingredient.unit).order_by(
+                Ingredient.name
+            )
+        )
+    ]
+    if request.method == "POST":
+        form = RecipeForm()
+    else:
+        form = RecipeForm(
+            data={
+                "lines": [
+                    {
+                        "ingredient": rr.ingredient_id,
+                        "quantity_required": rr.quantity_required,
+                    }
+                    for rr in sorted(
+                        menu_item.in_recipe_requirements,
+                        key=lambda rr: rr.ingredient.name,
+                    )
+                ]
+            }
+        )
+        for _ in range(RecipeForm.BLANK_LINES):
+            form.lines.append_entry()
+    for line in form.lines:
+        line.ingredient.choices = choices
+
+    if form.validate_on_submit():
+        quantities = {
+            line.ingredient.data: to_milli(line.quantity_required.data)
+            for line in form.lines
+            if line.ingredient.data
+        }
+        counts = menu_item.set_recipe(quantities)
+        mark_changed(db.session, menu_item_ids=[menu_item.id])
+        db.session.commit()
+        flash(
+            f"Рецепт блюда '{menu_item}' сохранён: добавлено {counts['inserted']}, "
+            f"изменено {counts['updated']}, удалено {counts['deleted']}."
+        )
+        return redirect(url_for("inventory.menu_items"))
+    return render_template(
+        "inventory/menu_item_recipe.html", form=form, menu_item=menu_item
+    )
+
+
 @bp.route(
     "/recipe_requirements/<int:recipe_requirement_id>/edit", methods=["GET", "POST"]
 )
@@ -263,19 +403,21 @@ def recipe_requirement_new():
 def recipe_requirement_edit(recipe_requirement_id):
     recipe_requirement = RecipeRequirement.query.get(recipe_requirement_id)
     form = RecipeRequirementForm()
-    if request.method == "POST":
+    if request.method == "POST" and form.quantity_required.validate(form):
         recipe_requirement.quantity_required = form.quantity_required.data
         db.session.commit()
         flash(
             f"Вы отредактировали требование рецепта для блюда {recipe_requirement.menu_item} ({recipe_requirement})."
         )
         return redirect(url_for("inventory.recipe_requirements"))
+    if request.method == "GET":
+        form = RecipeRequirementForm(obj=recipe_requirement)
 
     menu_item = MenuItem.query.get(recipe_requirement.menu_item_id)
     ingredient = Ingredient.query.get(recipe_requirement.ingredient_id)
     return render_template(
         "inventory/recipe_requirement_edit.html",
-        form=RecipeRequirementForm(obj=recipe_requirement),
+        form=form,
         recipe_requirement=recipe_requirement,
         menu_item=menu_item,
         ingredient=ingredient,
@@ -305,26 +447,40 @@ def recipe_requirement_delete(recipe_requirement_id):
 
 @bp.route("/purchases/")
 @login_required
+@conditional("purchase", "menu_item")
 def purchases():
-    purchases = Purchase.query.all()
-    return render_template("inventory/purchases.html", purchases=purchases)
+    start, end = date_range_from_args(request.args)
+    purchases = keyset_paginate(
+        Purchase.in_period(start, end).options(joinedload(Purchase.menu_item)),
+        [Purchase.time, Purchase.id],
+        descending=True,
+    )
+    return render_template(
+        "inventory/purchases.html", purchases=purchases, page=purchases
+    )
 
 
 @bp.route("/purchases/new", methods=["GET", "POST"])
 @login_required
 def purchase_new():
-    available_menu_items = [m for m in MenuItem.query.all() if m.is_available()]
+    available_menu_items = availability_cache.available_menu_items().all()
     form = PurchaseForm()
     form.available_menu_items.query = available_menu_items
     if form.validate_on_submit():
-        menu_item_id = form.available_menu_items.data.id
-        purchase = Purchase(menu_item_id=menu_item_id)
-        menu_item = MenuItem.query.get(menu_item_id)
-        for mirr in menu_item.in_recipe_requirements.all():
-            ingredient = Ingredient.query.get(mirr.ingredient_id)
-            ingredient.quantity_available -= mirr.quantity_required
-            db.session.commit()
+        menu_item = form.available_menu_items.data
+        purchase = Purchase(menu_item_id=menu_item.id)
+        # one transaction for the whole sale: all ingredients and the purchase
+        try:
+            ingredient_ids = menu_item.take_ingredients()
+        except OutOfStock as e:
+            db.session.rollback()
+            ingredient = db.session.get(Ingredient, e.ingredient_id)
+            flash(f"Не хватает ингредиента '{ingredient}' для блюда '{menu_item}'.")
+            return redirect(url_for("inventory.purchase_new"))
+        mark_changed(db.session, ingredient_ids=ingredient_ids)
         db.session.add(purchase)
+        db.session.flush()
+        rollups.add_purchases([(purchase.menu_item_id, purchase.time)])
         db.session.commit()
         flash(f"You've added {purchase}.")
         return redirect(url_for("inventory.purchases"))
@@ -345,6 +501,7 @@ def purchase_delete(purchase_id):
     purchase = Purchase.query.get(purchase_id)
     if request.method == "POST":
         if "yes" in request.form:
+            rollups.add_purchases([(purchase.menu_item_id, purchase.time)], sign=-1)
             db.session.delete(purchase)
             db.session.commit()
             flash(f"Вы удалили покупку из расчетов")
@@ -352,6 +509,21 @@ def purchase_delete(purchase_id):
     return render_template("inventory/purchase_delete.html", purchase=purchase)
 
 
+@bp.route("/capacity/")
+@login_required
+def capacity():
+    matrix = planner.matrix()
+    stock = planner.stock()
+    mix = planner.mix_from_args(request.args)
+    return render_template(
+        "inventory/capacity.html",
+        menu_items=planner.max_servings(matrix, stock),
+        stock=stock,
+        mix=mix,
+        what_if=planner.what_if(matrix, stock, mix) if mix else None,
+    )
+
+
 """
 Let's remove purchase edit because it doesn't make much sense in this context
 
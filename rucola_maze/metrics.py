@@ -0,0 +1,149 @@
+import hmac
+import threading
+import time
+from flask import (
+    Response,
+    abort,
+    g,
+    has_request_context,
+    request,
+    request_finished,
+    request_started,
+)
+from flask_login import current_user
+from sqlalchemy import event
+
+from .extensions import db
+
+
+# Per-request SQL query count, SQL time and wall time for every endpoint,
+# served as Prometheus histograms at /metrics. With METRICS_ENABLED off
+# (the default) nothing is hooked up at all, so there is no overhead.
+# Numbers are per process: with several workers each one reports its own.
+# /metrics needs a logged-in user, or with METRICS_TOKEN set, the header
+# "Authorization: Bearer <token>" (for a scraper that can't log in).
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (name, endpoint) -> Histogram
+
+    def observe(self, endpoint, wall_time, sql_time, queries):
+        with self.lock:
+            for name, buckets, value in (
+                ("rucola_request_duration_seconds", DURATION_BUCKETS, wall_time),
+                ("rucola_request_sql_duration_seconds", DURATION_BUCKETS, sql_time),
+                ("rucola_request_queries", QUERY_BUCKETS, queries),
+            ):
+                key = (name, endpoint)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(buckets)
+                self.histograms[key].observe(value)
+
+    def render(self):
+        help_texts = {
+            "rucola_request_duration_seconds": "Wall time of a request.",
+            "rucola_request_sql_duration_seconds": "Time spent in SQL per request.",
+            "rucola_request_queries": "SQL statements executed per request.",
+        }
+        lines = []
+        with self.lock:
+            for name, text in help_texts.items():
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (hist_name, endpoint), hist in sorted(self.histograms.items()):
+                    if hist_name != name:
+                        continue
+                    label = f'endpoint="{endpoint}"'
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {hist.count}')
+                    lines.append(f"{name}_sum{{{label}}} {hist.sum}")
+                    lines.append(f"{name}_count{{{label}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    app.config.setdefault("METRICS_ENABLED", False)
+    # log requests / statements slower than this many milliseconds (None: off)
+    app.config.setdefault("METRICS_SLOW_REQUEST_MS", None)
+    app.config.setdefault("METRICS_SLOW_QUERY_MS", None)
+    app.config.setdefault("METRICS_TOKEN", None)
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    metrics = app.extensions["metrics"] = Metrics()
+    slow_query_ms = app.config["METRICS_SLOW_QUERY_MS"]
+    slow_request_ms = app.config["METRICS_SLOW_REQUEST_MS"]
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, params, context, many):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, params, context, many):
+        elapsed = time.perf_counter() - conn.info["metrics_start"].pop()
+        if has_request_context() and "metrics_queries" in g:
+            g.metrics_queries += 1
+            g.metrics_sql_time += elapsed
+        if slow_query_ms is not None and elapsed * 1000 >= slow_query_ms:
+            app.logger.warning("slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+    def on_request_started(sender, **extra):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_sql_time = 0.0
+
+    def on_request_finished(sender, response, **extra):
+        if "metrics_start" not in g:
+            return
+        wall_time = time.perf_counter() - g.metrics_start
+        endpoint = request.endpoint or "unknown"
+        metrics.observe(endpoint, wall_time, g.metrics_sql_time, g.metrics_queries)
+        if slow_request_ms is not None and wall_time * 1000 >= slow_request_ms:
+            app.logger.warning(
+                "slow request %s (%.1f ms, %d queries, %.1f ms SQL)",
+                endpoint,
+                wall_time * 1000,
+                g.metrics_queries,
+                g.metrics_sql_time * 1000,
+            )
+
+    # weak=False: the handlers are closures that would otherwise be collected
+    request_started.connect(on_request_started, app, weak=False)
+    request_finished.connect(on_request_finished, app, weak=False)
+
+    def metrics_view():
+        token = app.config["METRICS_TOKEN"]
+        if token:
+            authorization = request.headers.get("Authorization", "")
+            allowed = hmac.compare_digest(authorization, f"Bearer {token}")
+        else:
+            allowed = current_user.is_authenticated
+        if not allowed:
+            abort(401)
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -1,10 +1,32 @@
-from .extensions import db, login_manager
+from .extensions import db
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from sqlalchemy.orm import mapped_column
+from sqlalchemy import case, delete, select, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
 from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 
 
+# Money is stored as integer cents (kopecks) and quantities as integer
+# thousandths of a unit, so sums and comparisons are exact, also in SQL.
+
+
+def to_milli(quantity):
+    return int((Decimal(str(quantity)) * 1000).to_integral_value(ROUND_HALF_UP))
+
+
+def from_milli(milli):
+    if milli is None:
+        return None
+    return Decimal(milli) / 1000
+
+
+def to_cents(dollars, cents=0):
+    return int(dollars) * 100 + int(cents)
+
+
 class User(UserMixin, db.Model):
     id = mapped_column(db.Integer, primary_key=True)
     username = mapped_column(db.String(64), unique=True, index=True)
@@ -22,84 +44,379 @@ class User(UserMixin, db.Model):
         return f"{self.username}"
 
 
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+class OutOfStock(Exception):
+    def __init__(self, ingredient_id):
+        super().__init__(ingredient_id)
+        self.ingredient_id = ingredient_id
 
 
 class Ingredient(db.Model):
     id = mapped_column(db.Integer, primary_key=True)
     name = mapped_column(db.String(96), unique=True, index=True)
-    quantity_available = mapped_column(
-        db.Numeric(precision=2, asdecimal=False, decimal_return_scale=None), default=0
-    )
+    quantity_available_milli = mapped_column(db.Integer, default=0)
     unit = mapped_column(db.String(16))
-    unit_price_dollars = mapped_column(db.Integer, default=0)
-    unit_price_cents = mapped_column(db.Integer, default=0)
+    unit_price = mapped_column(db.Integer, default=0)  # in cents
     in_recipe_requirements = db.relationship(
         "RecipeRequirement",
         backref="ingredient",
-        lazy="dynamic",
+        lazy="select",
         cascade="all, delete, delete-orphan",
     )
 
     def __str__(self):
         return self.name
 
+    @property
+    def quantity_available(self):
+        return from_milli(self.quantity_available_milli)
+
+    @quantity_available.setter
+    def quantity_available(self, quantity):
+        self.quantity_available_milli = to_milli(quantity)
+
+    @property
+    def unit_price_dollars(self):
+        return (self.unit_price or 0) // 100
+
+    @property
+    def unit_price_cents(self):
+        return (self.unit_price or 0) % 100
+
 
 class MenuItem(db.Model):
     id = mapped_column(db.Integer, primary_key=True)
     title = mapped_column(db.String(128), unique=True, index=True)
-    price_dollars = mapped_column(db.Integer)
-    price_cents = mapped_column(db.Integer, default=0)
+    price = mapped_column(db.Integer)  # in cents
     in_recipe_requirements = db.relationship(
         "RecipeRequirement",
         backref="menu_item",
-        lazy="dynamic",
+        lazy="select",
         cascade="all, delete, delete-orphan",
     )
     purchases = db.relationship(
         "Purchase",
         backref="menu_item",
-        lazy="dynamic",
+        lazy="select",
+        cascade="all, delete, delete-orphan",
+    )
+    sales_rollups = db.relationship(
+        "SalesRollup",
+        backref="menu_item",
+        lazy="select",
+        cascade="all, delete, delete-orphan",
+    )
+    archived_sales = db.relationship(
+        "ArchivedSales",
+        backref="menu_item",
+        lazy="select",
         cascade="all, delete, delete-orphan",
     )
 
     def __str__(self):
         return self.title
 
+    @property
+    def price_dollars(self):
+        return (self.price or 0) // 100
+
+    @property
+    def price_cents(self):
+        return (self.price or 0) % 100
+
     def is_available(self):
-        if self.in_recipe_requirements.all():
+        if self.in_recipe_requirements:
             # list of booleans - whether each recipe_requirement is in stock
             rr_availability_list = [
-                rr.in_stock() for rr in self.in_recipe_requirements.all()
+                rr.in_stock() for rr in self.in_recipe_requirements
             ]
             # check whether all the booleans in this list are "true"
             #  - if yes, then Menu_item.is_available() returns "true"
             return all(rr_availability_list)
         return False
 
+    @staticmethod
+    def available_ids_select():
+        # ids of menu items that have recipe requirements and none of them
+        # asks for more than the ingredient's quantity available
+        shortage = case(
+            (
+                RecipeRequirement.quantity_required_milli
+                <= Ingredient.quantity_available_milli,
+                0,
+            ),
+            else_=1,
+        )
+        return (
+            select(RecipeRequirement.menu_item_id)
+            .join(Ingredient, RecipeRequirement.ingredient_id == Ingredient.id)
+            .group_by(RecipeRequirement.menu_item_id)
+            .having(func.sum(shortage) == 0)
+        )
+
+    @classmethod
+    def available_ids(cls):
+        # same answer as is_available() for every menu item, in one statement
+        return set(db.session.scalars(cls.available_ids_select()))
+
+    @classmethod
+    def available(cls):
+        return cls.query.filter(cls.id.in_(cls.available_ids_select()))
+
+    def take_ingredients(self):
+        # Subtract one serving worth of every ingredient, each with a conditional
+        # UPDATE so stock can never go below zero even with concurrent sales.
+        # Doesn't commit: the caller commits or rolls back the whole sale.
+        # Returns ids of the ingredients that were changed.
+        requirements = db.session.execute(
+            select(
+                RecipeRequirement.ingredient_id,
+                RecipeRequirement.quantity_required_milli,
+            ).where(RecipeRequirement.menu_item_id == self.id)
+        ).all()
+        for ingredient_id, quantity_required in requirements:
+            result = db.session.execute(
+                update(Ingredient)
+                .where(
+                    Ingredient.id == ingredient_id,
+                    Ingredient.quantity_available_milli >= quantity_required,
+                )
+                .values(
+                    quantity_available_milli=Ingredient.quantity_available_milli
+                    - quantity_required
+                )
+            )
+            if result.rowcount != 1:
+                raise OutOfStock(ingredient_id)
+        return [ingredient_id for ingredient_id, _ in requirements]
+
+    def set_recipe(self, quantities):
+        # Replace the recipe with {ingredient_id: quantity_required_milli} as one
+        # diff: a DELETE for the ingredients no longer used and one upsert
+        # (executemany) for new and changed ones. Doesn't commit.
+        # Returns the numbers of inserted, updated and deleted requirements.
+        existing = dict(
+            db.session.execute(
+                select(
+                    RecipeRequirement.ingredient_id,
+                    RecipeRequirement.quantity_required_milli,
+                ).where(RecipeRequirement.menu_item_id == self.id)
+            ).all()
+        )
+        removed = existing.keys() - quantities.keys()
+        if removed:
+            db.session.execute(
+                delete(RecipeRequirement).where(
+                    RecipeRequirement.menu_item_id == self.id,
+                    RecipeRequirement.ingredient_id.in_(removed),
+                )
+            )
+        changed = [
+            {
+                "menu_item_id": self.id,
+                "ingredient_id": ingredient_id,
+                "quantity_required_milli": quantity,
+            }
+            for ingredient_id, quantity in quantities.items()
+            if existing.get(ingredient_id) != quantity
+        ]
+        if changed:
+            db.session.execute(RecipeRequirement.upsert(), changed)
+        db.session.expire(self, ["in_recipe_requirements"])
+        inserted = sum(1 for row in changed if row["ingredient_id"] not in existing)
+        return {
+            "inserted": inserted,
+            "updated": len(changed) - inserted,
+            "deleted": len(removed),
+        }
+
 
 class RecipeRequirement(db.Model):
+    # one requirement per ingredient and menu item; the index also serves
+    # lookups by menu item, the second one lookups by ingredient (stock
+    # changes, ingredient deletes) without touching the table
+    __table_args__ = (
+        db.Index(
+            "ix_recipe_requirement_menu_item_id_ingredient_id",
+            "menu_item_id",
+            "ingredient_id",
+            unique=True,
+        ),
+        db.Index(
+            "ix_recipe_requirement_ingredient_id_menu_item_id",
+            "ingredient_id",
+            "menu_item_id",
+        ),
+    )
+
     id = mapped_column(db.Integer, primary_key=True)
     ingredient_id = mapped_column(db.Integer, db.ForeignKey("ingredient.id"))
     menu_item_id = mapped_column(db.Integer, db.ForeignKey("menu_item.id"))
-    quantity_required = mapped_column(
-        db.Numeric(precision=2, asdecimal=False, decimal_return_scale=None)
-    )
+    quantity_required_milli = mapped_column(db.Integer)
 
     def __str__(self):
         return f"{self.ingredient}: {self.quantity_required} {self.ingredient.unit}"
 
+    @property
+    def quantity_required(self):
+        return from_milli(self.quantity_required_milli)
+
+    @quantity_required.setter
+    def quantity_required(self, quantity):
+        self.quantity_required_milli = to_milli(quantity)
+
     def in_stock(self):
-        ingredient = Ingredient.query.get(self.ingredient_id)  # the ing object
-        return self.quantity_required <= ingredient.quantity_available
+        return (
+            self.quantity_required_milli <= self.ingredient.quantity_available_milli
+        )
+
+    @classmethod
+    def upsert(cls):
+        # INSERT ... ON CONFLICT (menu_item_id, ingredient_id) DO UPDATE
+        stmt = sqlite_insert(cls)
+        return stmt.on_conflict_do_update(
+            index_elements=["menu_item_id", "ingredient_id"],
+            set_={"quantity_required_milli": stmt.excluded.quantity_required_milli},
+        )
+
+    @classmethod
+    def add(cls, menu_item_id, ingredient_id, quantity_required_milli):
+        # insert unless the pair exists (ON CONFLICT DO NOTHING, no check
+        # first, so no race); returns the new id or None
+        return db.session.scalar(
+            sqlite_insert(cls)
+            .values(
+                menu_item_id=menu_item_id,
+                ingredient_id=ingredient_id,
+                quantity_required_milli=quantity_required_milli,
+            )
+            .on_conflict_do_nothing(index_elements=["menu_item_id", "ingredient_id"])
+            .returning(cls.id)
+        )
 
 
 class Purchase(db.Model):
     id = mapped_column(db.Integer, primary_key=True)
-    menu_item_id = mapped_column(db.Integer, db.ForeignKey("menu_item.id"))
+    menu_item_id = mapped_column(db.Integer, db.ForeignKey("menu_item.id"), index=True)
     time = mapped_column(db.DateTime(), default=datetime.utcnow, index=True)
 
     def __str__(self):
         return f"purchase {self.id}: {self.menu_item}"
+
+    @classmethod
+    def in_period(cls, start=None, end=None):
+        # start included, end excluded; None means no bound
+        query = cls.query
+        if start is not None:
+            query = query.filter(cls.time >= start)
+        if end is not None:
+            query = query.filter(cls.time < end)
+        return query
+
+    @staticmethod
+    def sales_per_menu_item():
+        # (menu_item_id, purchases) rows counting both the purchases in this
+        # table and the archived ones (ArchivedSales), for the totals
+        return union_all(
+            select(
+                Purchase.menu_item_id, func.count().label("purchases")
+            ).group_by(Purchase.menu_item_id),
+            select(ArchivedSales.menu_item_id, ArchivedSales.purchases),
+        ).subquery()
+
+    @staticmethod
+    def revenue_cents_select():
+        sales = Purchase.sales_per_menu_item()
+        return (
+            select(func.sum(sales.c.purchases * MenuItem.price))
+            .select_from(sales)
+            .join(MenuItem, sales.c.menu_item_id == MenuItem.id)
+        )
+
+    @staticmethod
+    def revenue_cents():
+        # sum of menu item prices over all purchases, in one query
+        return db.session.scalar(Purchase.revenue_cents_select()) or 0
+
+    @staticmethod
+    def cost_of_ingredients_cents():
+        # sum of ingredient cost over all purchases:
+        # purchase -> menu item -> recipe requirements -> ingredient
+        # (cents * milli-units, summed as integers, then scaled back exactly)
+        sales = Purchase.sales_per_menu_item()
+        total = db.session.scalar(
+            select(
+                func.sum(
+                    sales.c.purchases
+                    * Ingredient.unit_price
+                    * RecipeRequirement.quantity_required_milli
+                )
+            )
+            .select_from(sales)
+            .join(
+                RecipeRequirement,
+                sales.c.menu_item_id == RecipeRequirement.menu_item_id,
+            )
+            .join(Ingredient, RecipeRequirement.ingredient_id == Ingredient.id)
+        )
+        return from_milli(total or 0)
+
+
+class TableVersion(db.Model):
+    # change counter of a table, see versions.py
+    name = mapped_column(db.String(64), primary_key=True)
+    version = mapped_column(db.Integer, default=0)
+
+
+class SalesRollup(db.Model):
+    # number of purchases of a menu item per hour / per day, kept up to date
+    # by rollups.add_purchases() so reports don't rescan every Purchase
+    __table_args__ = (
+        db.UniqueConstraint("granularity", "bucket", "menu_item_id"),
+    )
+
+    id = mapped_column(db.Integer, primary_key=True)
+    granularity = mapped_column(db.String(8))  # "hour" or "day"
+    bucket = mapped_column(db.DateTime())  # start of the hour / day
+    menu_item_id = mapped_column(db.Integer, db.ForeignKey("menu_item.id"), index=True)
+    purchases = mapped_column(db.Integer, default=0)
+
+    def __str__(self):
+        return f"{self.menu_item} {self.granularity} {self.bucket}: {self.purchases}"
+
+
+class StockChange(db.Model):
+    # change log of ingredient stock and recipes, written in the same
+    # transaction as the change; stock_events.py streams it to clients
+    __table_args__ = {"sqlite_autoincrement": True}  # ids are never reused
+
+    id = mapped_column(db.Integer, primary_key=True)
+    time = mapped_column(db.DateTime(), default=datetime.utcnow, index=True)
+    # no foreign keys: the row outlives a deleted ingredient or menu item
+    ingredient_id = mapped_column(db.Integer, nullable=True)
+    menu_item_id = mapped_column(db.Integer, nullable=True)
+
+
+class StockListening(db.Model):
+    # a single row: when a process last had an open stock event stream, so
+    # writers know whether anybody can use the StockChange rows
+    id = mapped_column(db.Integer, primary_key=True)
+    seen_at = mapped_column(db.DateTime())
+
+
+class PurchaseArchive(db.Model):
+    # purchases moved out of Purchase by archive.py; no foreign key, the
+    # history outlives a deleted menu item. purchase_id is the id the purchase
+    # had: SQLite reuses the ids of deleted purchases, so it isn't unique here.
+    id = mapped_column(db.Integer, primary_key=True)
+    purchase_id = mapped_column(db.Integer)
+    menu_item_id = mapped_column(db.Integer, index=True)
+    time = mapped_column(db.DateTime(), index=True)
+    archived_at = mapped_column(db.DateTime(), default=datetime.utcnow)
+
+
+class ArchivedSales(db.Model):
+    # number of archived purchases per menu item, so totals still count them
+    menu_item_id = mapped_column(
+        db.Integer, db.ForeignKey("menu_item.id"), primary_key=True
+    )
+    purchases = mapped_column(db.Integer, default=0)
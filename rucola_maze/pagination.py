@@ -0,0 +1,86 @@
+import base64
+import json
+from datetime import datetime
+from flask import abort, current_app, request
+from sqlalchemy import tuple_
+
+
+# Keyset (seek) pagination: instead of OFFSET we remember the sort key of the
+# last row shown and ask for rows after it, so every page costs the same
+# no matter how deep into the table it is. The sort key must be unique,
+# so the last column is always the primary key.
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    def __iter__(self):
+        return iter(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def next_args(self):
+        # query string for the next page, keeping filters of the current one
+        args = request.args.to_dict()
+        args["after"] = self.next_cursor
+        return args
+
+    @property
+    def first_args(self):
+        args = request.args.to_dict()
+        args.pop("after", None)
+        return args
+
+    @property
+    def is_first(self):
+        return "after" not in request.args
+
+
+def keyset_paginate(query, columns, descending=False, key=None):
+    # key(row) returns the values of columns for a row; by default they are
+    # read from the row itself by column name
+    per_page = request.args.get("per_page", type=int) or current_app.config[
+        "PER_PAGE"
+    ]
+    per_page = max(1, min(per_page, current_app.config["MAX_PER_PAGE"]))
+
+    cursor = request.args.get("after")
+    if cursor:
+        values = _decode(cursor, columns)
+        row_key = tuple_(*columns)
+        query = query.filter(row_key < values if descending else row_key > values)
+
+    order = [c.desc() if descending else c for c in columns]
+    # one extra row tells us whether there is a next page
+    rows = query.order_by(*order).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        values = key(last) if key else [getattr(last, c.key) for c in columns]
+        next_cursor = _encode(values)
+    return KeysetPage(items, next_cursor, per_page)
+
+
+def _encode(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode(cursor, columns):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(columns):
+            raise ValueError
+        return tuple(
+            datetime.fromisoformat(v) if c.type.python_type is datetime else v
+            for c, v in zip(columns, values)
+        )
+    except (ValueError, TypeError):
+        abort(400)
@@ -0,0 +1,181 @@
+import math
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+
+from .extensions import db
+from .models import Ingredient, MenuItem, RecipeRequirement
+from . import versions
+
+
+# Capacity planning.
+# The recipe matrix (menu items x ingredients, quantity required in
+# thousandths) is sparse: a dish uses a handful of the ingredients. We keep it
+# as rows {menu_item_id: [(ingredient_id, required_milli)]}, built once and
+# reused until the menu or a recipe changes (table versions), so evaluating
+# the whole menu is one stock query plus a pass over the non-zero entries.
+#
+# max servings of a dish = min over its requirements of available // required;
+# requirements for 0 don't limit it (None if nothing does), a dish without
+# requirements can't be sold (0), as in MenuItem.is_available().
+#
+# what-if: for a sales mix in servings per hour, every ingredient is used up
+# at sum(rate x required) per hour; it runs out after available / that.
+
+MATRIX_TABLES = ("menu_item", "recipe_requirement")
+
+
+class RecipeMatrix:
+    def __init__(self, menu_items, rows):
+        self.menu_items = menu_items  # [(id, title)] by title
+        self.rows = rows  # menu_item_id -> [(ingredient_id, required_milli)]
+
+    @classmethod
+    def load(cls):
+        menu_items = db.session.execute(
+            select(MenuItem.id, MenuItem.title).order_by(MenuItem.title, MenuItem.id)
+        ).all()
+        rows = {id: [] for id, _ in menu_items}
+        for menu_item_id, ingredient_id, required in db.session.execute(
+            select(
+                RecipeRequirement.menu_item_id,
+                RecipeRequirement.ingredient_id,
+                RecipeRequirement.quantity_required_milli,
+            )
+        ):
+            if menu_item_id in rows:
+                rows[menu_item_id].append((ingredient_id, required or 0))
+        return cls([tuple(row) for row in menu_items], rows)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.key = None
+        self.matrix = None
+        self.builds = 0
+
+
+def init_app(app):
+    app.extensions["planner"] = _State()
+
+
+def matrix():
+    state = current_app.extensions["planner"]
+    current = versions.current(MATRIX_TABLES)
+    key = tuple(current.get(table, 0) for table in MATRIX_TABLES)
+    with state.lock:
+        if state.key != key or state.matrix is None:
+            state.matrix = RecipeMatrix.load()
+            state.key = key
+            state.builds += 1
+        return state.matrix
+
+
+def stock():
+    # ingredient_id -> (name, unit, quantity_available_milli)
+    return {
+        id: (name, unit, quantity or 0)
+        for id, name, unit, quantity in db.session.execute(
+            select(
+                Ingredient.id,
+                Ingredient.name,
+                Ingredient.unit,
+                Ingredient.quantity_available_milli,
+            )
+        )
+    }
+
+
+def mix_from_args(args):
+    # "mix-<menu item id>" = servings per hour, as sent by the planner form
+    mix = {}
+    for key in args:
+        if key.startswith("mix-") and key[4:].isdigit():
+            rate = args.get(key, type=float)
+            if rate and math.isfinite(rate):
+                mix[int(key[4:])] = rate
+    return mix
+
+
+def max_servings(matrix, stock):
+    # [{"id", "title", "max_servings", "limiting_ingredient_id"}] for the menu
+    result = []
+    for id, title in matrix.menu_items:
+        requirements = matrix.rows[id]
+        servings, limiting = None, None
+        for ingredient_id, required in requirements:
+            if required <= 0:
+                continue
+            portions = stock[ingredient_id][2] // required
+            if servings is None or portions < servings:
+                servings, limiting = portions, ingredient_id
+        if not requirements:
+            servings = 0
+        result.append(
+            {
+                "id": id,
+                "title": title,
+                "max_servings": servings,
+                "limiting_ingredient_id": limiting,
+            }
+        )
+    return result
+
+
+MAX_HOURS = 10**9  # "never" for a tiny rate, still a finite JSON number
+
+
+def what_if(matrix, stock, mix, now=None):
+    # mix: {menu_item_id: servings per hour}. Returns the ingredients the mix
+    # uses, those that run out first first, and per dish when its first
+    # ingredient runs out.
+    now = now or datetime.utcnow()
+    demand = {}
+    for menu_item_id, rate in mix.items():
+        if not (rate > 0 and math.isfinite(rate)):
+            continue
+        for ingredient_id, required in matrix.rows.get(menu_item_id, ()):
+            if required > 0:
+                demand[ingredient_id] = demand.get(ingredient_id, 0) + rate * required
+
+    ingredients = []
+    hours_left = {}
+    for ingredient_id, per_hour in demand.items():
+        name, unit, available = stock[ingredient_id]
+        hours = min(available / per_hour, MAX_HOURS)
+        hours_left[ingredient_id] = hours
+        ingredients.append(
+            {
+                "id": ingredient_id,
+                "name": name,
+                "unit": unit,
+                "quantity_available_milli": available,
+                "demand_milli_per_hour": round(per_hour, 3),
+                "hours": round(hours, 3),
+                "runs_out_at": _runs_out_at(now, hours),
+            }
+        )
+    ingredients.sort(key=lambda ingredient: (ingredient["hours"], ingredient["id"]))
+
+    menu_items = []
+    for id, title in matrix.menu_items:
+        hours = [
+            hours_left[ingredient_id]
+            for ingredient_id, required in matrix.rows[id]
+            if required > 0 and ingredient_id in hours_left
+        ]
+        if hours:
+            menu_items.append(
+                {"id": id, "title": title, "hours": round(min(hours), 3)}
+            )
+    menu_items.sort(key=lambda menu_item: (menu_item["hours"], menu_item["id"]))
+    return {"ingredients": ingredients, "menu_items": menu_items}
+
+
+def _runs_out_at(now, hours):
+    try:
+        return (now + timedelta(hours=hours)).isoformat(timespec="minutes")
+    except OverflowError:
+        return None  # after datetime.max
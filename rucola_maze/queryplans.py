@@ -0,0 +1,200 @@
+import re
+from datetime import datetime
+from sqlalchemy import delete, select, tuple_, update
+
+from .extensions import db
+from .models import (
+    Ingredient,
+    MenuItem,
+    Purchase,
+    RecipeRequirement,
+    SalesRollup,
+    StockChange,
+    TableVersion,
+    User,
+)
+from . import rollups
+
+
+# EXPLAIN QUERY PLAN for the statements the app runs most (or that have to stay
+# cheap as tables grow), so a missing index or a query that stops using one
+# shows up in `flask explain` instead of in production. A "SCAN <table>" step
+# reads the whole table (or a whole index of it) and fails the check, unless
+# the query needs every row anyway and says so in allow_scans.
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 1, 2)
+
+
+def key_queries():
+    # [(label, statement, tables that may be scanned)]
+    return [
+        (
+            "MenuItem.available_ids",
+            MenuItem.available_ids_select(),
+            {"recipe_requirement"},  # every menu item
+        ),
+        (
+            "availability refresh of some menu items",
+            MenuItem.available_ids_select().where(
+                RecipeRequirement.menu_item_id.in_([1, 2])
+            ),
+            set(),
+        ),
+        (
+            "menu items using an ingredient",
+            select(RecipeRequirement.menu_item_id).where(
+                RecipeRequirement.ingredient_id.in_([1, 2])
+            ),
+            set(),
+        ),
+        (
+            "MenuItem.take_ingredients: requirements",
+            select(
+                RecipeRequirement.ingredient_id,
+                RecipeRequirement.quantity_required_milli,
+            ).where(RecipeRequirement.menu_item_id == 1),
+            set(),
+        ),
+        (
+            "MenuItem.take_ingredients: conditional update",
+            update(Ingredient)
+            .where(Ingredient.id == 1, Ingredient.quantity_available_milli >= 1)
+            .values(
+                quantity_available_milli=Ingredient.quantity_available_milli - 1
+            ),
+            set(),
+        ),
+        (
+            "recipe requirement of a pair",
+            select(RecipeRequirement.id).where(
+                RecipeRequirement.menu_item_id == 1,
+                RecipeRequirement.ingredient_id == 2,
+            ),
+            set(),
+        ),
+        (
+            "menu item delete: its purchases",
+            delete(Purchase).where(Purchase.menu_item_id == 1),
+            set(),
+        ),
+        (
+            "menu item delete: its rollups",
+            delete(SalesRollup).where(SalesRollup.menu_item_id == 1),
+            set(),
+        ),
+        (
+            "ingredient delete: its requirements",
+            delete(RecipeRequirement).where(RecipeRequirement.ingredient_id == 1),
+            set(),
+        ),
+        (
+            "purchases page",
+            select(Purchase)
+            .where(Purchase.time >= START, Purchase.time < END)
+            .where(tuple_(Purchase.time, Purchase.id) < (END, 1000))
+            .order_by(Purchase.time.desc(), Purchase.id.desc())
+            .limit(51),
+            set(),
+        ),
+        (
+            "menu items page",
+            select(MenuItem)
+            .where(tuple_(MenuItem.title, MenuItem.id) > ("m", 1))
+            .order_by(MenuItem.title, MenuItem.id)
+            .limit(51),
+            set(),
+        ),
+        (
+            "rollups report",
+            rollups.report_select(START, END, "hour"),
+            {"recipe_requirement"},  # unit cost of every menu item
+        ),
+        (
+            "delivery import: ingredients by name",
+            select(Ingredient.id).where(Ingredient.name.in_(["a", "b"])),
+            set(),
+        ),
+        (
+            "stock events: new log rows",
+            select(StockChange.id, StockChange.ingredient_id).where(
+                StockChange.id > 1
+            ),
+            set(),
+        ),
+        (
+            "stock events: prune",
+            delete(StockChange).where(StockChange.time < START),
+            set(),
+        ),
+        (
+            "table versions",
+            select(TableVersion.name, TableVersion.version).where(
+                TableVersion.name.in_(["ingredient", "menu_item"])
+            ),
+            set(),
+        ),
+        ("load user", select(User).where(User.id == 1), set()),
+        (
+            "Purchase.revenue_cents",
+            Purchase.revenue_cents_select(),
+            # totals over all purchases and archived sales
+            {"purchase", "archived_sales"},
+        ),
+        (
+            "archive: next batch",
+            select(Purchase.id).where(Purchase.time < START).limit(500),
+            set(),
+        ),
+    ]
+
+
+# SQLite before 3.36 writes "SCAN TABLE x" / "SEARCH TABLE x"
+STEP = re.compile(r"^(?:SCAN|SEARCH) (?:TABLE )?\w+")
+SCAN = re.compile(
+    r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX \w+)?$"
+)
+
+
+def plan(statement):
+    # the detail column of EXPLAIN QUERY PLAN, one string per step
+    compiled = statement.compile(
+        dialect=db.engine.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    params = compiled.construct_params()
+    positional = tuple(params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + str(compiled), positional
+    )
+    return [row[-1] for row in rows]
+
+
+def full_scans(details, allow_scans=()):
+    # scans of subqueries (anon_1 etc.) are about rows already selected
+    scans = []
+    for detail in details:
+        match = SCAN.match(detail)
+        if (
+            match
+            and match.group(1) in db.metadata.tables
+            and match.group(1) not in allow_scans
+        ):
+            scans.append(match.group(1))
+    return scans
+
+
+def problems(details, allow_scans=()):
+    # a plan without a single step we understand must not pass silently
+    if not any(STEP.match(detail) for detail in details):
+        return ["unrecognized plan"]
+    return [f"FULL SCAN of {table}" for table in full_scans(details, allow_scans)]
+
+
+def check():
+    # [(label, plan, problems)] for every key query
+    results = []
+    for label, statement, allow_scans in key_queries():
+        details = plan(statement)
+        results.append((label, details, problems(details, allow_scans)))
+    db.session.rollback()
+    return results
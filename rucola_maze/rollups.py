@@ -0,0 +1,130 @@
+from collections import Counter
+from sqlalchemy import delete, insert, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
+
+from .extensions import db
+from .models import (
+    Ingredient,
+    MenuItem,
+    Purchase,
+    PurchaseArchive,
+    RecipeRequirement,
+    SalesRollup,
+)
+
+
+# Hourly and daily purchase counts per menu item (the SalesRollup table).
+# Only counts are stored: revenue and cost are computed from them with the
+# current prices, the same way the home page totals are, so a report over
+# rollups always agrees with the totals and deleting a purchase simply
+# subtracts one from its buckets.
+
+# how SQLite's strftime spells the start of a bucket in a DateTime column
+BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00:00.000000",
+    "day": "%Y-%m-%d 00:00:00.000000",
+}
+
+
+def bucket_start(time, granularity):
+    if granularity == "hour":
+        return time.replace(minute=0, second=0, microsecond=0)
+    return time.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_purchases(purchases, sign=1):
+    # purchases: (menu_item_id, time) pairs; sign=-1 when they are deleted.
+    # Runs in the caller's transaction, so it commits together with the sale.
+    # Purchases without a time belong to no bucket and are skipped.
+    counts = Counter()
+    for menu_item_id, time in purchases:
+        if time is None:
+            continue
+        for granularity in BUCKET_FORMATS:
+            counts[(granularity, bucket_start(time, granularity), menu_item_id)] += sign
+    if not counts:
+        return
+    table = SalesRollup.__table__
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["granularity", "bucket", "menu_item_id"],
+        set_={"purchases": table.c.purchases + stmt.excluded.purchases},
+    )
+    db.session.execute(
+        stmt,
+        [
+            {
+                "granularity": granularity,
+                "bucket": bucket,
+                "menu_item_id": menu_item_id,
+                "purchases": n,
+            }
+            for (granularity, bucket, menu_item_id), n in counts.items()
+        ],
+    )
+
+
+def rebuild():
+    # recount everything from the purchase table and the archived purchases
+    # (of menu items that still exist); purchases without a time are skipped
+    table = SalesRollup.__table__
+    db.session.execute(delete(table))
+    sales = union_all(
+        select(Purchase.menu_item_id, Purchase.time).where(Purchase.time.is_not(None)),
+        select(PurchaseArchive.menu_item_id, PurchaseArchive.time).where(
+            PurchaseArchive.menu_item_id.in_(select(MenuItem.id)),
+            PurchaseArchive.time.is_not(None),
+        ),
+    ).subquery()
+    for granularity, fmt in BUCKET_FORMATS.items():
+        bucket = func.strftime(fmt, sales.c.time)
+        db.session.execute(
+            insert(table).from_select(
+                ["granularity", "bucket", "menu_item_id", "purchases"],
+                select(
+                    literal(granularity), bucket, sales.c.menu_item_id, func.count()
+                ).group_by(bucket, sales.c.menu_item_id),
+            )
+        )
+
+
+def report(start=None, end=None, granularity="day"):
+    # one row per bucket in [start, end): bucket, purchases, revenue_cents,
+    # cost_of_ingredients_milli_cents (cents * thousandths, see models.to_milli)
+    return db.session.execute(report_select(start, end, granularity)).all()
+
+
+def report_select(start=None, end=None, granularity="day"):
+    unit_cost = (
+        select(
+            RecipeRequirement.menu_item_id,
+            func.sum(
+                Ingredient.unit_price * RecipeRequirement.quantity_required_milli
+            ).label("milli_cents"),
+        )
+        .join(Ingredient, RecipeRequirement.ingredient_id == Ingredient.id)
+        .group_by(RecipeRequirement.menu_item_id)
+        .subquery()
+    )
+    query = (
+        select(
+            SalesRollup.bucket,
+            func.sum(SalesRollup.purchases).label("purchases"),
+            func.sum(SalesRollup.purchases * MenuItem.price).label("revenue_cents"),
+            func.sum(
+                SalesRollup.purchases * func.coalesce(unit_cost.c.milli_cents, 0)
+            ).label("cost_of_ingredients_milli_cents"),
+        )
+        .join(MenuItem, SalesRollup.menu_item_id == MenuItem.id)
+        .outerjoin(unit_cost, SalesRollup.menu_item_id == unit_cost.c.menu_item_id)
+        .where(SalesRollup.granularity == granularity)
+        .group_by(SalesRollup.bucket)
+        .having(func.sum(SalesRollup.purchases) != 0)
+        .order_by(SalesRollup.bucket)
+    )
+    if start is not None:
+        query = query.where(SalesRollup.bucket >= start)
+    if end is not None:
+        query = query.where(SalesRollup.bucket < end)
+    return query
@@ -0,0 +1,117 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select
+
+from .extensions import db
+from .models import (
+    ArchivedSales,
+    Ingredient,
+    MenuItem,
+    Purchase,
+    PurchaseArchive,
+    RecipeRequirement,
+    SalesRollup,
+)
+from . import rollups
+
+
+# Reproducible synthetic data for benchmarks: the same arguments and seed
+# always give the same rows.
+
+UNITS = ["кг", "л", "шт."]
+
+
+def clear():
+    # everything except users
+    for model in (
+        SalesRollup,
+        ArchivedSales,
+        PurchaseArchive,
+        Purchase,
+        RecipeRequirement,
+        MenuItem,
+        Ingredient,
+    ):
+        db.session.execute(delete(model))
+
+
+def has_data():
+    return any(
+        db.session.scalar(select(model.id).limit(1)) is not None
+        for model in (Ingredient, MenuItem)
+    )
+
+
+def generate(
+    ingredients=100,
+    menu_items=50,
+    requirements=5,
+    purchases=10000,
+    days=90,
+    seed=0,
+    end=None,
+):
+    if days < 1:
+        raise ValueError("days must be at least 1")
+    rnd = random.Random(seed)
+    end = end or datetime(2024, 1, 1)
+
+    db.session.execute(
+        insert(Ingredient),
+        [
+            {
+                "name": f"ingredient-{i:05d}",
+                # plenty of stock so most of the menu stays available
+                "quantity_available_milli": rnd.randint(10_000, 100_000_000),
+                "unit": rnd.choice(UNITS),
+                "unit_price": rnd.randint(10, 100_000),
+            }
+            for i in range(ingredients)
+        ],
+    )
+    db.session.execute(
+        insert(MenuItem),
+        [
+            {"title": f"menu-item-{i:05d}", "price": rnd.randint(5_000, 200_000)}
+            for i in range(menu_items)
+        ],
+    )
+    ingredient_ids = list(
+        db.session.scalars(select(Ingredient.id).order_by(Ingredient.id))
+    )
+    menu_item_ids = list(
+        db.session.scalars(select(MenuItem.id).order_by(MenuItem.id))
+    )
+
+    db.session.execute(
+        insert(RecipeRequirement),
+        [
+            {
+                "menu_item_id": menu_item_id,
+                "ingredient_id": ingredient_id,
+                "quantity_required_milli": rnd.randint(1, 2_000),
+            }
+            for menu_item_id in menu_item_ids
+            for ingredient_id in rnd.sample(
+                ingredient_ids, min(requirements, len(ingredient_ids))
+            )
+        ],
+    )
+
+    start = end - timedelta(days=days)
+    span = int((end - start).total_seconds())
+    batch = []
+    for _ in range(purchases):
+        batch.append(
+            {
+                "menu_item_id": rnd.choice(menu_item_ids),
+                "time": start + timedelta(seconds=rnd.randrange(span)),
+            }
+        )
+        if len(batch) == 10_000:
+            db.session.execute(insert(Purchase), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Purchase), batch)
+
+    rollups.rebuild()
@@ -0,0 +1,331 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .extensions import db
+from .models import (
+    Ingredient,
+    MenuItem,
+    RecipeRequirement,
+    StockChange,
+    StockListening,
+)
+
+
+# Server-sent events about stock.
+# Every write that changes an ingredient's quantity or a recipe appends rows
+# to the StockChange log in its own transaction (record(), called from the
+# availability hooks), whatever process it runs in. Each web process runs one
+# poller thread that reads new log rows every STOCK_EVENTS_POLL seconds and
+# fans a delta out to all its open streams, so a poll costs a few queries
+# however many clients are connected:
+#   id: 42
+#   data: {"ingredients":[{"id":3,"quantity_available_milli":1500}],
+#          "menu_items":[{"id":7,"available":false}]}
+# "menu_items" lists only dishes whose availability flipped; a deleted
+# ingredient has quantity_available_milli null. A client that reconnects with
+# Last-Event-ID gets what it missed; if the log was pruned past that point it
+# gets a "reset" event and should reload the full menu (/api/menu).
+# Nothing is logged while no process has had an open stream for
+# STOCK_EVENTS_RETENTION seconds: pollers note in the StockListening row when
+# they last had subscribers. Old rows are pruned by the writers themselves
+# (every PRUNE_EVERY logged writes) and by the pollers.
+
+HEARTBEAT = 15  # seconds between keep-alive comments
+QUEUE_SIZE = 100  # pending events per client before it is disconnected
+PRUNE_EVERY = 1000  # logged writes per process between two prunes
+LISTENING_ID = 1  # the one StockListening row
+
+
+def init_app(app):
+    app.config.setdefault("STOCK_EVENTS", True)
+    app.config.setdefault("STOCK_EVENTS_POLL", 0.5)  # seconds
+    app.config.setdefault("STOCK_EVENTS_RETENTION", 3600)  # seconds
+    app.extensions["stock_events"] = _Broadcaster(app)
+
+
+def record(session, ingredient_ids=(), menu_item_ids=()):
+    if not has_app_context() or not current_app.config["STOCK_EVENTS"]:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {"ingredient_id": id, "menu_item_id": None, "time": now}
+        for id in ingredient_ids
+    ]
+    rows += [
+        {"ingredient_id": None, "menu_item_id": id, "time": now}
+        for id in menu_item_ids
+    ]
+    if not rows:
+        return
+    # straight on the connection, like versions.bump()
+    connection = session.connection()
+    retention = current_app.config["STOCK_EVENTS_RETENTION"]
+    if not _listening(connection, now - timedelta(seconds=retention)):
+        return  # nobody streams or can resume from these rows
+    connection.execute(insert(StockChange.__table__), rows)
+    broadcaster = current_app.extensions["stock_events"]
+    with broadcaster.lock:
+        broadcaster.recorded += 1
+        due = broadcaster.recorded % PRUNE_EVERY == 0
+    if due:
+        prune(connection, retention)
+
+
+def _listening(connection, since):
+    seen_at = connection.execute(
+        select(StockListening.seen_at).where(StockListening.id == LISTENING_ID)
+    ).scalar()
+    return seen_at is not None and seen_at >= since
+
+
+def prune(connection, retention):
+    connection.execute(
+        delete(StockChange.__table__).where(
+            StockChange.time < datetime.utcnow() - timedelta(seconds=retention)
+        )
+    )
+
+
+def delta(ingredient_ids, menu_item_ids, available=None):
+    # payload for a set of changes; with `available` (the menu item ids that
+    # were available before) only flips are listed, otherwise the current
+    # state of every affected menu item. Returns (payload, available now).
+    quantities = dict(
+        db.session.execute(
+            select(Ingredient.id, Ingredient.quantity_available_milli).where(
+                Ingredient.id.in_(ingredient_ids)
+            )
+        ).all()
+    )
+    affected = set(menu_item_ids) | set(
+        db.session.scalars(
+            select(RecipeRequirement.menu_item_id).where(
+                RecipeRequirement.ingredient_id.in_(ingredient_ids)
+            )
+        )
+    )
+    now_available = set(
+        db.session.scalars(
+            MenuItem.available_ids_select().where(
+                RecipeRequirement.menu_item_id.in_(affected)
+            )
+        )
+    )
+    menu_items = [
+        {"id": id, "available": id in now_available}
+        for id in sorted(affected)
+        if available is None or (id in available) != (id in now_available)
+    ]
+    if available is not None:
+        available = (available - affected) | now_available
+    payload = {
+        "ingredients": [
+            {"id": id, "quantity_available_milli": quantities.get(id)}
+            for id in sorted(ingredient_ids)
+        ],
+        "menu_items": menu_items,
+    }
+    return payload, available
+
+
+def changes(after_id, up_to_id=None):
+    # (last id, ingredient ids, menu item ids) of the log rows after after_id
+    query = select(
+        StockChange.id, StockChange.ingredient_id, StockChange.menu_item_id
+    ).where(StockChange.id > after_id)
+    if up_to_id is not None:
+        query = query.where(StockChange.id <= up_to_id)
+    last_id, ingredient_ids, menu_item_ids = after_id, set(), set()
+    for id, ingredient_id, menu_item_id in db.session.execute(query):
+        last_id = max(last_id, id)
+        if ingredient_id is not None:
+            ingredient_ids.add(ingredient_id)
+        if menu_item_id is not None:
+            menu_item_ids.add(menu_item_id)
+    return last_id, ingredient_ids, menu_item_ids
+
+
+def format_event(payload, id=None, event=None):
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    if id is not None:
+        lines.append(f"id: {id}")
+    lines.append("data: " + json.dumps(payload, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.dropped = False
+
+
+class _Broadcaster:
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+        self.last_id = 0
+        self.gap_id = -1  # Last-Event-IDs up to this one can't be resumed
+        self.available = set()
+        self.polls = 0
+        self.events = 0
+        self.recorded = 0
+
+    def subscribe(self):
+        # returns the subscriber and the last log id it will not be sent
+        subscriber = _Subscriber()
+        with self.lock:
+            if self.thread is None:
+                self._start()
+            self.subscribers.add(subscriber)
+            return subscriber, self.last_id
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def close(self):
+        # end every open stream and let the poller stop, e.g. on shutdown
+        with self.lock:
+            thread = self.thread
+            for subscriber in self.subscribers:
+                subscriber.dropped = True
+                try:
+                    subscriber.queue.put_nowait(None)
+                except queue.Full:
+                    pass
+            self.subscribers.clear()
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "subscribers": len(self.subscribers),
+                "last_id": self.last_id,
+                "polls": self.polls,
+                "events": self.events,
+            }
+
+    def _start(self):
+        continuous = self._mark_listening()
+        self.last_id = db.session.scalar(select(func.max(StockChange.id))) or 0
+        if not continuous:
+            # changes since the last stream closed were not logged
+            self.gap_id = self.last_id
+        self.available = MenuItem.available_ids()
+        db.session.rollback()  # don't hold the read transaction open
+        self.thread = threading.Thread(
+            target=self._run, name="stock-events", daemon=True
+        )
+        self.thread.start()
+
+    def _run(self):
+        interval = self.app.config["STOCK_EVENTS_POLL"]
+        # well within the retention, so writers never stop logging meanwhile
+        refresh = min(60, self.app.config["STOCK_EVENTS_RETENTION"] / 4)
+        marked_at = time.monotonic()
+        while True:
+            time.sleep(interval)
+            with self.app.app_context():
+                try:
+                    if not self._poll():
+                        return
+                    if time.monotonic() - marked_at > refresh:
+                        self._mark_listening()
+                        marked_at = time.monotonic()
+                except Exception:
+                    self.app.logger.exception("stock events poll failed")
+                finally:
+                    db.session.remove()
+
+    def _poll(self):
+        # False once nobody listens any more; the next subscriber restarts us
+        with self.lock:
+            if not self.subscribers:
+                self.thread = None
+                return False
+        self.polls += 1
+        last_id, ingredient_ids, menu_item_ids = changes(self.last_id)
+        if last_id == self.last_id:
+            return True
+        payload, available = delta(ingredient_ids, menu_item_ids, self.available)
+        with self.lock:
+            self.last_id, self.available = last_id, available
+            if not payload["ingredients"] and not payload["menu_items"]:
+                return True  # e.g. a recipe edit that flipped nothing
+            message = format_event(payload, id=last_id)
+            self.events += 1
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.queue.put_nowait(message)
+                except queue.Full:
+                    # too slow: disconnect, it will resume from Last-Event-ID
+                    subscriber.dropped = True
+                    self.subscribers.discard(subscriber)
+        return True
+
+    def _mark_listening(self):
+        # tells writers to keep logging; returns whether they already were
+        retention = self.app.config["STOCK_EVENTS_RETENTION"]
+        now = datetime.utcnow()
+        connection = db.session.connection()
+        listening = _listening(connection, now - timedelta(seconds=retention))
+        stmt = sqlite_insert(StockListening.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"], set_={"seen_at": stmt.excluded.seen_at}
+        )
+        connection.execute(stmt, {"id": LISTENING_ID, "seen_at": now})
+        prune(connection, retention)
+        db.session.commit()
+        return listening
+
+
+def stream(last_event_id=None):
+    # generator of SSE text for one client; call it inside a request, it
+    # does its database work before the first yield
+    broadcaster = current_app.extensions["stock_events"]
+    subscriber, subscribed_at = broadcaster.subscribe()
+
+    backlog = []
+    if last_event_id is not None and (
+        last_event_id < subscribed_at or last_event_id <= broadcaster.gap_id
+    ):
+        oldest = db.session.scalar(select(func.min(StockChange.id)))
+        if (
+            last_event_id <= broadcaster.gap_id
+            or oldest is None
+            or oldest > last_event_id + 1
+        ):
+            backlog.append(format_event({}, id=subscribed_at, event="reset"))
+        else:
+            _, ingredient_ids, menu_item_ids = changes(last_event_id, subscribed_at)
+            payload, _ = delta(ingredient_ids, menu_item_ids)
+            backlog.append(format_event(payload, id=subscribed_at))
+    db.session.remove()  # a stream can stay open for hours
+
+    def generate():
+        try:
+            yield "retry: 2000\n\n"
+            yield from backlog
+            while not subscriber.dropped:
+                try:
+                    message = subscriber.queue.get(timeout=HEARTBEAT)
+                except queue.Empty:
+                    message = ": keep-alive\n\n"
+                if message is None:
+                    break
+                yield message
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return generate()
@@ -0,0 +1,77 @@
+from sqlalchemy import event
+
+from .extensions import db
+
+
+# SQLite storage profile, applied to every new connection.
+# "tuned": WAL so readers don't wait for writers, synchronous=NORMAL (in WAL
+# mode a commit no longer fsyncs, a checkpoint does), a busy timeout instead
+# of instant "database is locked" errors, a bigger page cache and mmap, and
+# foreign key enforcement.
+# "default": leave SQLite's own defaults alone.
+# SQLITE_PRAGMAS overrides single pragmas of the chosen profile; engine and
+# pool options go to SQLALCHEMY_ENGINE_OPTIONS as usual for Flask-SQLAlchemy.
+
+PROFILES = {
+    "tuned": {
+        "journal_mode": "WAL",
+        "busy_timeout": 5000,  # ms
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,  # negative: KiB, i.e. 64 MiB
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    "default": {},
+}
+
+REPORTED_PRAGMAS = [
+    "journal_mode",
+    "busy_timeout",
+    "synchronous",
+    "mmap_size",
+    "cache_size",
+    "temp_store",
+    "foreign_keys",
+]
+
+
+def pragmas(config):
+    return {**PROFILES[config["STORAGE_PROFILE"]], **config["SQLITE_PRAGMAS"]}
+
+
+def init_app(app):
+    app.config.setdefault("STORAGE_PROFILE", "tuned")
+    app.config.setdefault("SQLITE_PRAGMAS", {})
+    settings = pragmas(app.config)
+
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+
+    if settings:
+
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in settings.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    with app.app_context():
+        app.logger.info(
+            "SQLite storage profile '%s': %s, engine options: %s",
+            app.config["STORAGE_PROFILE"],
+            active_settings(),
+            app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        )
+
+
+def active_settings():
+    # what the database reports, not what we asked for
+    with db.engine.connect() as connection:
+        return {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in REPORTED_PRAGMAS
+        }
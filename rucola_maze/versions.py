@@ -0,0 +1,114 @@
+import hashlib
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .extensions import db
+from .models import Ingredient, MenuItem, Purchase, RecipeRequirement, TableVersion
+
+
+# A change counter per table, stored in the database (TableVersion) so it
+# survives restarts and is shared by every worker process. It is bumped inside
+# the writing transaction, once per transaction and table, both for unit of
+# work flushes and for bulk INSERT/UPDATE/DELETE statements run through the
+# session. List views derive their ETag from it and answer a matching
+# If-None-Match with 304 before running any query or template.
+
+TRACKED_TABLES = {
+    model.__tablename__
+    for model in (Ingredient, MenuItem, RecipeRequirement, Purchase)
+}
+
+
+def bump(session, tables):
+    bumped = session.info.setdefault("versions_bumped", set())
+    tables = set(tables) & TRACKED_TABLES - bumped
+    if not tables:
+        return
+    bumped.update(tables)
+    stmt = sqlite_insert(TableVersion.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"version": TableVersion.__table__.c.version + 1},
+    )
+    # straight on the connection: a session.execute() here would re-enter
+    # the do_orm_execute hook below
+    session.connection().execute(
+        stmt, [{"name": name, "version": 1} for name in sorted(tables)]
+    )
+
+
+def current(tables):
+    # read once per request: the ETag and the fragment cache both need them
+    key = tuple(sorted(tables))
+    cache = g.setdefault("table_versions", {})
+    if key not in cache:
+        cache[key] = dict(
+            db.session.execute(
+                select(TableVersion.name, TableVersion.version).where(
+                    TableVersion.name.in_(key)
+                )
+            ).all()
+        )
+    return cache[key]
+
+
+@event.listens_for(db.session, "after_flush")
+def _bump_flushed(session, flush_context):
+    changed = list(session.new) + list(session.deleted)
+    changed += [obj for obj in session.dirty if session.is_modified(obj)]
+    bump(session, {obj.__table__.name for obj in changed})
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def _bump_bulk(orm_execute_state):
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None:
+        bump(orm_execute_state.session, {table.name})
+
+
+@event.listens_for(db.session, "after_commit")
+@event.listens_for(db.session, "after_rollback")
+def _reset(session):
+    session.info.pop("versions_bumped", None)
+
+
+def conditional(*tables):
+    # Weak ETag from the versions of the tables a page shows, the user, the
+    # full URL (pagination, filters) and the static asset manifest (a page
+    # links hashed file names). Pages with pending flash messages are
+    # always rendered, so a message is never swallowed by a 304.
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if "_flashes" in session:
+                return view(*args, **kwargs)
+            versions = current(tables)
+            key = "|".join(
+                [
+                    request.full_path,
+                    str(current_user.get_id()),
+                    current_app.extensions["assets"]["version"],
+                ]
+                + [f"{name}={versions.get(name, 0)}" for name in sorted(tables)]
+            )
+            etag = hashlib.sha1(key.encode()).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return wrapped
+
+    return decorator
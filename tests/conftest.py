@@ -0,0 +1,38 @@
+import pytest
+
+from rucola_maze import create_app
+from rucola_maze.extensions import db
+from rucola_maze.models import User
+
+
+@pytest.fixture
+def app(tmp_path):
+    # a file database, so tests can also use it from several threads
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+            "WTF_CSRF_ENABLED": False,
+        }
+    )
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def user(app):
+    with app.app_context():
+        user = User(username="test", email="test@example.com")
+        user.set_password("test")
+        db.session.add(user)
+        db.session.commit()
+    return {"email": "test@example.com", "password": "test"}
+
+
+@pytest.fixture
+def client(app, user):
+    client = app.test_client()
+    client.post("/auth/login", data=user)
+    client.get("/")  # shows (and clears) the login flash
+    return client
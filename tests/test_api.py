@@ -0,0 +1,70 @@
+from rucola_maze.api import BATCH_MAX_LINES, BATCH_MAX_QUANTITY
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient, MenuItem, RecipeRequirement
+
+
+def _dish(app):
+    with app.app_context():
+        water = Ingredient(name="вода", quantity_available_milli=10**12, unit="л")
+        tea = MenuItem(title="чай", price=5_000)
+        db.session.add_all([water, tea])
+        db.session.flush()
+        db.session.add(
+            RecipeRequirement(
+                menu_item_id=tea.id, ingredient_id=water.id, quantity_required_milli=0
+            )
+        )
+        db.session.commit()
+        return tea.id
+
+
+def test_batch_rejects_too_many_lines(app, client):
+    tea_id = _dish(app)
+    lines = [{"menu_item_id": tea_id}] * (BATCH_MAX_LINES + 1)
+    response = client.post("/api/purchases/batch", json={"lines": lines})
+    assert response.status_code == 400
+
+
+def test_batch_limits_quantity_per_line(app, client):
+    tea_id = _dish(app)
+    response = client.post(
+        "/api/purchases/batch",
+        json={
+            "lines": [
+                {"menu_item_id": tea_id, "quantity": 10**9},
+                {"menu_item_id": 10**30},
+                {"menu_item_id": tea_id, "quantity": BATCH_MAX_QUANTITY},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["status"] for r in results] == ["error", "error", "ok"]
+    assert response.get_json()["purchases"] == BATCH_MAX_QUANTITY
+
+
+def test_capacity_what_if_with_extreme_rates(app, client):
+    with app.app_context():
+        water = Ingredient(name="вода", quantity_available_milli=10**9, unit="л")
+        tea = MenuItem(title="чай", price=5_000)
+        db.session.add_all([water, tea])
+        db.session.flush()
+        db.session.add(
+            RecipeRequirement(
+                menu_item_id=tea.id, ingredient_id=water.id, quantity_required_milli=250
+            )
+        )
+        db.session.commit()
+        tea_id = tea.id
+
+    for rate in (1e-6, 1e-320):
+        response = client.post("/api/capacity", json={"mix": {str(tea_id): rate}})
+        assert response.status_code == 200
+        [ingredient] = response.get_json()["what_if"]["ingredients"]
+        assert ingredient["runs_out_at"] is None
+        assert b"Infinity" not in response.data
+    for rate in ("nan", "inf", "-inf"):
+        response = client.post("/api/capacity", json={"mix": {str(tea_id): rate}})
+        assert response.status_code == 400
+    response = client.get(f"/capacity/?mix-{tea_id}=0.000001")
+    assert response.status_code == 200
@@ -0,0 +1,51 @@
+from datetime import datetime
+from sqlalchemy import func, insert, select
+
+from rucola_maze import archive, rollups, seed
+from rucola_maze.extensions import db
+from rucola_maze.models import Purchase, PurchaseArchive
+
+
+def _totals():
+    return (
+        Purchase.revenue_cents(),
+        Purchase.cost_of_ingredients_cents(),
+        rollups.report(granularity="day"),
+        rollups.report(granularity="hour"),
+    )
+
+
+def test_archiving_keeps_totals_and_rollups(app):
+    with app.app_context():
+        seed.generate(ingredients=20, menu_items=10, requirements=3, purchases=2000)
+        db.session.commit()
+        before = _totals()
+        assert before[0] > 0
+
+        assert archive.archive(datetime(2023, 11, 15), batch_size=300, pause=0) > 0
+        assert _totals() == before
+        # a rebuild counts the archived purchases too
+        rollups.rebuild()
+        db.session.commit()
+        assert _totals() == before
+
+
+def test_archiving_again_after_purchase_ids_are_reused(app):
+    with app.app_context():
+        seed.generate(ingredients=5, menu_items=3, purchases=50)
+        db.session.commit()
+        assert archive.archive(datetime(2024, 1, 1), pause=0) == 50
+        menu_item_id = db.session.scalar(select(PurchaseArchive.menu_item_id))
+        # with the purchase table empty SQLite hands out ids from 1 again
+        db.session.execute(
+            insert(Purchase),
+            [{"menu_item_id": menu_item_id, "time": datetime(2024, 1, 2)}] * 5,
+        )
+        db.session.commit()
+        assert db.session.scalar(select(func.min(Purchase.id))) == 1
+
+        assert archive.archive(datetime(2024, 2, 1), pause=0) == 5
+        assert db.session.scalar(select(func.count(PurchaseArchive.id))) == 55
+        assert db.session.scalar(
+            select(func.count()).where(PurchaseArchive.purchase_id == 1)
+        ) == 2
@@ -0,0 +1,61 @@
+import pytest
+
+from rucola_maze import assets, create_app
+from rucola_maze.extensions import db
+
+
+@pytest.fixture
+def no_vendor(monkeypatch, tmp_path):
+    # as on an install where `flask assets vendor` was never run
+    monkeypatch.setattr(
+        assets, "VENDOR", {"vendor/missing.css": "https://cdn.test/x.css"}
+    )
+
+
+def _render(tmp_path, **config):
+    app = create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+            **config,
+        }
+    )
+    with app.test_request_context():
+        url = assets.url_for("static", filename="vendor/missing.css")
+        db.engine.dispose()
+    return url
+
+
+def test_missing_vendor_file_is_loaded_from_its_cdn(no_vendor, tmp_path, caplog):
+    assert _render(tmp_path) == "https://cdn.test/x.css"
+    assert "flask assets vendor" not in caplog.text
+
+
+def test_without_cdn_fallback_a_missing_file_is_an_error(no_vendor, tmp_path, caplog):
+    url = _render(tmp_path, ASSETS_CDN_FALLBACK=False)
+    assert url == "/static/vendor/missing.css"
+    assert "flask assets vendor" in caplog.text
+
+
+def test_build_keeps_the_previous_build(tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    names = []
+    for content in ("a {}", "b {}", "c {}"):
+        (static / "style.css").write_text(content)
+        names.append(assets.build(str(static))["style.css"])
+    dist = static / assets.DIST
+    assert not (dist / names[0]).exists()
+    assert not (dist / (names[0] + ".gz")).exists()
+    assert (dist / names[1]).read_text() == "b {}"
+    assert (dist / names[2]).read_text() == "c {}"
+
+
+def test_etag_changes_with_the_asset_manifest(app, client):
+    first = client.get("/ingredients/")
+    app.extensions["assets"]["version"] = assets.manifest_version(
+        {"style.css": "style.0123456789ab.css"}
+    )
+    second = client.get("/ingredients/", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
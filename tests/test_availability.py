@@ -0,0 +1,30 @@
+import random
+from sqlalchemy import update
+
+from rucola_maze import seed
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient, MenuItem, RecipeRequirement
+
+
+def test_available_ids_match_is_available(app):
+    with app.app_context():
+        seed.generate(ingredients=40, menu_items=60, requirements=4, purchases=0)
+        # low stock, so that many dishes lack something
+        rnd = random.Random(1)
+        for ingredient in Ingredient.query:
+            ingredient.quantity_available_milli = rnd.randint(0, 3000)
+        # a dish without requirements is never available
+        db.session.add(MenuItem(title="no recipe", price=100))
+        # a requirement that asks for exactly what is left is still in stock
+        requirement = RecipeRequirement.query.first()
+        db.session.execute(
+            update(Ingredient)
+            .where(Ingredient.id == requirement.ingredient_id)
+            .values(quantity_available_milli=requirement.quantity_required_milli)
+        )
+        db.session.commit()
+
+        expected = {item.id for item in MenuItem.query if item.is_available()}
+        assert 0 < len(expected) < MenuItem.query.count()
+        assert MenuItem.available_ids() == expected
+        assert {item.id for item in MenuItem.available()} == expected
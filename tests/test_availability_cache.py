@@ -0,0 +1,109 @@
+import pytest
+
+from rucola_maze.availability import availability_cache
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient, MenuItem, RecipeRequirement
+
+
+@pytest.fixture
+def menu(app):
+    # 1 kg of flour and of eggs, no salt; the cache is built before the test
+    with app.app_context():
+        flour, eggs, salt = (
+            Ingredient(
+                name=name, quantity_available_milli=quantity, unit="кг", unit_price=100
+            )
+            for name, quantity in (("мука", 1000), ("яйца", 1000), ("соль", 0))
+        )
+        dishes = {
+            "pancake": [(flour, 500), (eggs, 500)],
+            "bread": [(flour, 600)],
+            "omelette": [(eggs, 1000)],
+        }
+        items = {title: MenuItem(title=title, price=1000) for title in dishes}
+        db.session.add_all([flour, eggs, salt, *items.values()])
+        db.session.flush()
+        for title, requirements in dishes.items():
+            for ingredient, quantity in requirements:
+                db.session.add(
+                    RecipeRequirement(
+                        menu_item_id=items[title].id,
+                        ingredient_id=ingredient.id,
+                        quantity_required_milli=quantity,
+                    )
+                )
+        db.session.commit()
+        ids = {title: item.id for title, item in items.items()}
+        ids.update(flour=flour.id, eggs=eggs.id, salt=salt.id)
+        assert _available(app) == {ids["pancake"], ids["bread"], ids["omelette"]}
+    return ids
+
+
+def _available(app):
+    # what the cache says, checked against the uncached query
+    with app.app_context():
+        cached = availability_cache.available_ids()
+        assert cached == MenuItem.available_ids()
+        return cached
+
+
+def test_sale_updates_dishes_sharing_its_ingredients(app, client, menu):
+    response = client.post(
+        "/purchases/new", data={"available_menu_items": menu["pancake"]}
+    )
+    assert response.status_code == 302
+    # half the flour and eggs are left
+    assert _available(app) == {menu["pancake"]}
+
+
+def test_ingredient_edit(app, client, menu):
+    response = client.post(
+        f"/ingredients/{menu['eggs']}/edit",
+        data={
+            "name": "яйца",
+            "quantity_available": "0.5",
+            "unit": "кг",
+            "unit_price_dollars": 1,
+            "unit_price_cents": 0,
+        },
+    )
+    assert response.status_code == 302
+    assert _available(app) == {menu["pancake"], menu["bread"]}
+
+
+def test_recipe_change(app, client, menu):
+    def post(lines):
+        data = {}
+        for i, (ingredient_id, quantity) in enumerate(lines):
+            data[f"lines-{i}-ingredient"] = ingredient_id
+            data[f"lines-{i}-quantity_required"] = quantity
+        response = client.post(f"/menu_items/{menu['bread']}/recipe", data=data)
+        assert response.status_code == 302
+
+    post([(menu["flour"], "0.6"), (menu["salt"], "0.01")])
+    assert _available(app) == {menu["pancake"], menu["omelette"]}
+    post([(menu["flour"], "0.6")])
+    assert _available(app) == {menu["pancake"], menu["bread"], menu["omelette"]}
+
+
+def test_rollback_leaves_the_cache_alone(app, menu):
+    with app.app_context():
+        db.session.get(Ingredient, menu["flour"]).quantity_available_milli = 0
+        db.session.flush()
+        db.session.rollback()
+    assert _available(app) == {menu["pancake"], menu["bread"], menu["omelette"]}
+
+
+def test_menu_item_and_ingredient_delete(app, client, menu):
+    response = client.post(f"/menu_items/{menu['omelette']}/delete", data={"yes": "1"})
+    assert response.status_code == 302
+    assert _available(app) == {menu["pancake"], menu["bread"]}
+
+    # the egg requirement goes with the eggs, so pancakes need only flour;
+    # then the flour requirements go and nothing has a recipe left
+    response = client.post(f"/ingredients/{menu['eggs']}/delete", data={"yes": "1"})
+    assert response.status_code == 302
+    assert _available(app) == {menu["pancake"], menu["bread"]}
+    response = client.post(f"/ingredients/{menu['flour']}/delete", data={"yes": "1"})
+    assert response.status_code == 302
+    assert _available(app) == set()
@@ -0,0 +1,17 @@
+def test_seed_refuses_to_seed_twice(app):
+    runner = app.test_cli_runner()
+    with app.app_context():
+        result = runner.invoke(args=["seed", "--purchases", "10"])
+        assert result.exit_code == 0, result.output
+        result = runner.invoke(args=["seed", "--purchases", "10"])
+        assert result.exit_code == 1
+        assert "--reset" in result.output
+        result = runner.invoke(args=["seed", "--purchases", "10", "--reset"])
+        assert result.exit_code == 0, result.output
+
+
+def test_seed_needs_at_least_one_day(app):
+    with app.app_context():
+        result = app.test_cli_runner().invoke(args=["seed", "--days", "0"])
+    assert result.exit_code == 2
+    assert "--days" in result.output
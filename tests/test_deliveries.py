@@ -0,0 +1,50 @@
+from sqlalchemy import select
+
+from rucola_maze import deliveries
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient
+
+
+def test_huge_numbers_are_per_line_errors(app):
+    with app.app_context():
+        results = deliveries.import_lines(
+            deliveries.read(
+                "name,quantity,unit,unit_price\n"
+                "мука,1e30,кг,\n"
+                "соль,1,кг,1e30\n"
+                "сахар,600000000,кг,\n"
+                "сахар,600000000,кг,\n"
+                "вода,2,л,\n"
+            )
+        )
+        db.session.commit()
+        assert [r["status"] for r in results] == [
+            "error",
+            "error",
+            "created",
+            "error",
+            "created",
+        ]
+        stock = dict(
+            db.session.execute(
+                select(Ingredient.name, Ingredient.quantity_available_milli)
+            ).all()
+        )
+        assert stock == {"сахар": 600_000_000_000, "вода": 2_000}
+
+
+def test_new_ingredient_on_several_lines_counts_as_created(app):
+    with app.app_context():
+        db.session.add(Ingredient(name="мука", unit="кг"))
+        db.session.commit()
+        results = deliveries.import_lines(
+            [
+                {"name": "мука", "quantity": 1},
+                {"name": "яйца", "quantity": 10, "unit": "шт."},
+                {"name": "яйца", "quantity": 20},
+            ]
+        )
+        db.session.commit()
+        assert deliveries.summary(results) == {"created": 2, "updated": 1, "error": 0}
+        eggs = db.session.scalar(select(Ingredient).where(Ingredient.name == "яйца"))
+        assert eggs.quantity_available_milli == 30_000
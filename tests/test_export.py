@@ -0,0 +1,93 @@
+import csv
+import io
+import tracemalloc
+from datetime import datetime
+from sqlalchemy import func, insert, select, update
+
+from rucola_maze import archive, seed
+from rucola_maze.export import _money
+from rucola_maze.extensions import db
+from rucola_maze.models import MenuItem, Purchase, PurchaseArchive
+
+ROWS = 10_000
+
+
+def test_money_keeps_the_sign():
+    assert _money(0) == "0.00"
+    assert _money(1250) == "12.50"
+    assert _money(-50) == "-0.50"
+    assert _money(-1250) == "-12.50"
+    assert _money(None) is None
+
+
+def _stream(client, fmt):
+    # (bytes, lines, peak traced memory) of reading the export to the end
+    response = client.get(f"/export/purchases.{fmt}", buffered=False)
+    assert response.status_code == 200
+    size = lines = 0
+    tracemalloc.start()
+    try:
+        for chunk in response.response:
+            size += len(chunk)
+            lines += chunk.count(b"\n" if isinstance(chunk, bytes) else "\n")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        response.close()
+    return size, lines, peak
+
+
+def test_purchase_export_streams_in_bounded_memory(app, client):
+    with app.app_context():
+        seed.generate(ingredients=10, menu_items=10, purchases=ROWS)
+        db.session.commit()
+        menu_item_id = db.session.scalar(select(MenuItem.id))
+    small = {fmt: _stream(client, fmt) for fmt in ("csv", "ndjson")}
+
+    with app.app_context():
+        db.session.execute(
+            insert(Purchase),
+            [{"menu_item_id": menu_item_id} for _ in range(ROWS * 3)],
+        )
+        db.session.commit()
+    for fmt in ("csv", "ndjson"):
+        size, lines, peak = _stream(client, fmt)
+        assert lines == ROWS * 4 + (fmt == "csv")  # csv has a header line
+        assert size > 3 * small[fmt][0]
+        # four times the rows, about the same peak: a few batches at a time
+        assert peak < small[fmt][2] * 1.5
+        assert peak < 2 * 1024 * 1024
+
+
+def test_purchase_export_survives_odd_rows(app, client):
+    with app.app_context():
+        item = MenuItem(title="возврат", price=-50)
+        db.session.add(item)
+        db.session.flush()
+        db.session.add(Purchase(menu_item_id=item.id))
+        db.session.flush()
+        db.session.execute(update(Purchase).values(time=None))
+        db.session.commit()
+
+    response = client.get("/export/purchases.csv")
+    assert response.status_code == 200
+    [row] = csv.DictReader(io.StringIO(response.get_data(as_text=True)))
+    assert row["price"] == "-0.50"
+    assert row["time"] == ""
+
+
+def test_purchase_export_includes_archived_purchases(app, client):
+    with app.app_context():
+        seed.generate(ingredients=10, menu_items=10, purchases=500)
+        db.session.commit()
+        before = client.get("/export/purchases.csv").get_data(as_text=True)
+        assert archive.archive(datetime(2023, 11, 15), pause=0) > 0
+        assert db.session.scalar(select(func.count(PurchaseArchive.id))) > 0
+
+    after = client.get("/export/purchases.csv").get_data(as_text=True)
+    assert after == before
+    ranged = "/export/purchases.csv?from=2023-11-01&to=2023-11-30"
+    rows = list(csv.DictReader(io.StringIO(client.get(ranged).get_data(as_text=True))))
+    assert rows
+    assert all("2023-11-01" <= row["time"] < "2023-12-01" for row in rows)
+    assert any(row["time"] < "2023-11-15" for row in rows)
@@ -0,0 +1,74 @@
+from sqlalchemy import update
+
+from rucola_maze import versions
+from rucola_maze.extensions import db
+from rucola_maze.fragments import fragment_cache
+from rucola_maze.models import MenuItem
+
+
+def _menu_item(app):
+    with app.app_context():
+        item = MenuItem(title="суп", price=25_000)
+        db.session.add(item)
+        db.session.commit()
+        return item.id
+
+
+def _stats(app):
+    with app.app_context():
+        return fragment_cache.stats()
+
+
+def _page(client):
+    response = client.get("/menu_items/")
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_second_render_is_a_hit(app, client):
+    _menu_item(app)
+    first = _page(client)
+    assert _stats(app)["misses"] == 1
+    assert _page(client) == first
+    assert _stats(app)["hits"] == 1
+
+
+def test_write_renders_the_fragment_again(app, client):
+    item_id = _menu_item(app)
+    assert "суп" in _page(client)
+
+    with app.app_context():
+        db.session.get(MenuItem, item_id).title = "борщ"
+        db.session.commit()
+    html = _page(client)
+    assert "борщ" in html and "суп" not in html
+    assert _stats(app)["misses"] == 2
+
+    # a bulk UPDATE through the session bumps the version as well
+    with app.app_context():
+        db.session.execute(
+            update(MenuItem).where(MenuItem.id == item_id).values(title="щи")
+        )
+        db.session.commit()
+    assert "щи" in _page(client)
+    assert _stats(app)["misses"] == 3
+
+
+def test_bump_alone_makes_the_entry_unreachable(app, client):
+    _menu_item(app)
+    _page(client)
+    for table in ("menu_item", "recipe_requirement", "ingredient"):
+        with app.app_context():
+            versions.bump(db.session, {table})
+            db.session.commit()
+        _page(client)
+    stats = _stats(app)
+    assert (stats["hits"], stats["misses"], stats["fragments"]) == (0, 4, 4)
+
+
+def test_disabled_cache_always_renders(app, client):
+    app.config["FRAGMENT_CACHE"] = False
+    _menu_item(app)
+    _page(client)
+    _page(client)
+    assert _stats(app)["fragments"] == 0
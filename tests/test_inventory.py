@@ -0,0 +1,62 @@
+import pytest
+from datetime import datetime
+
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient, MenuItem, Purchase
+
+
+def test_negative_price_is_rejected_with_an_error(app, client):
+    with app.app_context():
+        item = MenuItem(title="суп", price=25_000)
+        db.session.add(item)
+        db.session.commit()
+        item_id = item.id
+
+    response = client.post(
+        f"/menu_items/{item_id}/edit",
+        data={"title": "суп", "price_dollars": -5, "price_cents": 0},
+    )
+    assert response.status_code == 200
+    assert "цена не может быть отрицательной" in response.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.get(MenuItem, item_id).price == 25_000
+
+
+@pytest.mark.parametrize("quantity", ["Infinity", "NaN", "1e30", "-1"])
+def test_unusable_quantity_is_rejected_with_an_error(app, client, quantity):
+    with app.app_context():
+        ingredient = Ingredient(
+            name="мука", quantity_available_milli=5000, unit="кг", unit_price=4500
+        )
+        db.session.add(ingredient)
+        db.session.commit()
+        ingredient_id = ingredient.id
+
+    response = client.post(
+        f"/ingredients/{ingredient_id}/edit",
+        data={
+            "name": "мука",
+            "quantity_available": quantity,
+            "unit": "кг",
+            "unit_price_dollars": 45,
+            "unit_price_cents": 0,
+        },
+    )
+    assert response.status_code == 200
+    assert 'class="error"' in response.get_data(as_text=True)
+    with app.app_context():
+        assert db.session.get(Ingredient, ingredient_id).quantity_available_milli == 5000
+
+
+def test_date_filter_up_to_the_last_date(app, client):
+    with app.app_context():
+        item = MenuItem(title="суп", price=25_000)
+        db.session.add(item)
+        db.session.flush()
+        db.session.add(Purchase(menu_item_id=item.id, time=datetime(2024, 5, 1)))
+        db.session.commit()
+
+    for url in ("/purchases/?to=9999-12-31", "/export/purchases.csv?to=9999-12-31"):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "суп" in response.get_data(as_text=True)
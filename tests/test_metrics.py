@@ -0,0 +1,55 @@
+import pytest
+
+from rucola_maze import create_app
+from rucola_maze.extensions import db
+from rucola_maze.models import User
+
+
+def _app(tmp_path, **config):
+    return create_app(
+        {
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+            "WTF_CSRF_ENABLED": False,
+            "METRICS_ENABLED": True,
+            **config,
+        }
+    )
+
+
+@pytest.fixture
+def metrics_app(tmp_path):
+    app = _app(tmp_path)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_metrics_need_a_login(metrics_app):
+    client = metrics_app.test_client()
+    assert client.get("/metrics").status_code == 401
+
+
+def test_metrics_for_a_logged_in_user(metrics_app):
+    with metrics_app.app_context():
+        user = User(username="admin", email="admin@example.com")
+        user.set_password("admin")
+        db.session.add(user)
+        db.session.commit()
+    client = metrics_app.test_client()
+    client.post("/auth/login", data={"email": "admin@example.com", "password": "admin"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert b"rucola_request_duration_seconds" in response.data
+
+
+def test_metrics_token(tmp_path):
+    app = _app(tmp_path, METRICS_TOKEN="secret")
+    client = app.test_client()
+    assert client.get("/metrics").status_code == 401
+    wrong = {"Authorization": "Bearer nope"}
+    assert client.get("/metrics", headers=wrong).status_code == 401
+    right = {"Authorization": "Bearer secret"}
+    assert client.get("/metrics", headers=right).status_code == 200
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,61 @@
+import threading
+from sqlalchemy import func, select
+
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient, MenuItem, Purchase, RecipeRequirement
+
+
+def test_concurrent_sales_never_oversell(app, user):
+    with app.app_context():
+        flour = Ingredient(name="мука", quantity_available_milli=10_000, unit="кг")
+        eggs = Ingredient(name="яйца", quantity_available_milli=100_000, unit="шт.")
+        pancake = MenuItem(title="блин", price=10_000)
+        db.session.add_all([flour, eggs, pancake])
+        db.session.flush()
+        db.session.add_all(
+            [
+                RecipeRequirement(
+                    menu_item_id=pancake.id,
+                    ingredient_id=flour.id,
+                    quantity_required_milli=1_000,
+                ),
+                RecipeRequirement(
+                    menu_item_id=pancake.id,
+                    ingredient_id=eggs.id,
+                    quantity_required_milli=2_000,
+                ),
+            ]
+        )
+        db.session.commit()
+        pancake_id = pancake.id
+
+    # 40 attempts from 8 tills for 10 pancakes' worth of flour
+    start = threading.Barrier(8)
+    failures = []
+
+    def till():
+        client = app.test_client()
+        client.post("/auth/login", data=user)
+        start.wait()
+        for _ in range(5):
+            response = client.post(
+                "/purchases/new", data={"available_menu_items": pancake_id}
+            )
+            if response.status_code not in (200, 302):
+                failures.append(response.status_code)
+
+    threads = [threading.Thread(target=till) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert failures == []
+    with app.app_context():
+        assert db.session.scalar(select(func.count(Purchase.id))) == 10
+        quantities = dict(
+            db.session.execute(
+                select(Ingredient.name, Ingredient.quantity_available_milli)
+            ).all()
+        )
+        assert quantities == {"мука": 0, "яйца": 80_000}
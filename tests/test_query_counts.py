@@ -0,0 +1,38 @@
+from rucola_maze import seed
+from rucola_maze.bench import QueryCounter
+from rucola_maze.extensions import db
+
+PAGES = [
+    "/",
+    "/ingredients/",
+    "/menu_items/",
+    "/recipe_requirements/",
+    "/purchases/",
+    "/purchases/new",
+]
+
+
+def _counts(app, client, size):
+    with app.app_context():
+        seed.clear()
+        seed.generate(
+            ingredients=size, menu_items=size, requirements=4, purchases=size * 10
+        )
+        db.session.commit()
+        counter = QueryCounter(db.engine)
+    counts = {}
+    for page in PAGES:
+        client.get(page)  # warms the caches that are built once
+        counter.count = 0
+        assert client.get(page).status_code == 200
+        counts[page] = counter.count
+    return counts
+
+
+def test_list_pages_run_a_constant_number_of_queries(app, client):
+    # no N+1: ten times the rows, the same statements
+    app.config["FRAGMENT_CACHE"] = False
+    small = _counts(app, client, 5)
+    large = _counts(app, client, 50)
+    assert large == small
+    assert max(large.values()) <= 6
@@ -0,0 +1,34 @@
+from rucola_maze import queryplans, seed
+from rucola_maze.extensions import db
+
+
+def test_key_queries_use_indexes(app):
+    with app.app_context():
+        seed.generate(ingredients=20, menu_items=20, purchases=500)
+        db.session.commit()
+        failed = {
+            label: (problems, details)
+            for label, details, problems in queryplans.check()
+            if problems
+        }
+    assert failed == {}
+
+
+def test_full_scans_read_both_plan_formats(app):
+    with app.app_context():
+        for details in (
+            ["SCAN purchase", "SEARCH menu_item USING INTEGER PRIMARY KEY (rowid=?)"],
+            ["SCAN TABLE purchase", "SEARCH TABLE menu_item USING INTEGER PRIMARY KEY"],
+        ):
+            assert queryplans.problems(details) == ["FULL SCAN of purchase"]
+            assert queryplans.problems(details, {"purchase"}) == []
+        assert queryplans.problems(
+            ["SCAN TABLE purchase USING COVERING INDEX ix_purchase_time"]
+        ) == ["FULL SCAN of purchase"]
+        assert queryplans.problems(["SCAN anon_1"]) == []
+
+
+def test_unrecognized_plans_fail(app):
+    with app.app_context():
+        assert queryplans.problems([]) == ["unrecognized plan"]
+        assert queryplans.problems(["READ purchase"]) == ["unrecognized plan"]
@@ -0,0 +1,112 @@
+from sqlalchemy import func, select
+
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient, MenuItem, RecipeRequirement
+
+
+def _menu(app):
+    # a dish and four ingredients; the dish needs the first three
+    with app.app_context():
+        ingredients = [
+            Ingredient(name=name, quantity_available_milli=10_000, unit="кг", unit_price=100)
+            for name in ("a", "b", "c", "d")
+        ]
+        item = MenuItem(title="суп", price=25_000)
+        db.session.add_all(ingredients + [item])
+        db.session.flush()
+        for ingredient, quantity in zip(ingredients, (1000, 2000, 500)):
+            db.session.add(
+                RecipeRequirement(
+                    menu_item_id=item.id,
+                    ingredient_id=ingredient.id,
+                    quantity_required_milli=quantity,
+                )
+            )
+        db.session.commit()
+        return item.id, [ingredient.id for ingredient in ingredients]
+
+
+def _recipe(menu_item_id):
+    return dict(
+        db.session.execute(
+            select(
+                RecipeRequirement.ingredient_id,
+                RecipeRequirement.quantity_required_milli,
+            ).where(RecipeRequirement.menu_item_id == menu_item_id)
+        ).all()
+    )
+
+
+def test_set_recipe_counts_inserts_updates_and_deletes(app):
+    item_id, (a, b, c, d) = _menu(app)
+    with app.app_context():
+        item = db.session.get(MenuItem, item_id)
+        counts = item.set_recipe({a: 1000, b: 3000, d: 100})
+        db.session.commit()
+        assert counts == {"inserted": 1, "updated": 1, "deleted": 1}
+        assert _recipe(item_id) == {a: 1000, b: 3000, d: 100}
+
+        assert item.set_recipe({a: 1000, b: 3000, d: 100}) == {
+            "inserted": 0,
+            "updated": 0,
+            "deleted": 0,
+        }
+
+
+def _post_recipe(client, item_id, lines):
+    data = {}
+    for i, (ingredient_id, quantity) in enumerate(lines):
+        data[f"lines-{i}-ingredient"] = ingredient_id
+        data[f"lines-{i}-quantity_required"] = quantity
+    return client.post(f"/menu_items/{item_id}/recipe", data=data)
+
+
+def test_recipe_form_saves_the_recipe(app, client):
+    item_id, (a, b, c, d) = _menu(app)
+    response = _post_recipe(client, item_id, [(a, "1"), (c, "0.25"), (d, "2.5"), (0, "")])
+    assert response.status_code == 302
+    with app.app_context():
+        assert _recipe(item_id) == {a: 1000, c: 250, d: 2500}
+
+
+def test_recipe_form_rejects_a_repeated_ingredient(app, client):
+    item_id, (a, b, c, d) = _menu(app)
+    response = _post_recipe(client, item_id, [(a, "1"), (a, "2")])
+    assert response.status_code == 200
+    assert "только один раз" in response.get_data(as_text=True)
+    with app.app_context():
+        assert _recipe(item_id) == {a: 1000, b: 2000, c: 500}
+
+
+def test_recipe_form_rejects_unusable_quantities(app, client):
+    item_id, (a, b, c, d) = _menu(app)
+    for quantity in ("Infinity", "NaN", "1e30", "-1"):
+        response = _post_recipe(client, item_id, [(a, quantity)])
+        assert response.status_code == 200
+        assert 'class="error"' in response.get_data(as_text=True)
+    with app.app_context():
+        assert _recipe(item_id) == {a: 1000, b: 2000, c: 500}
+
+
+def test_add_does_nothing_for_an_existing_pair(app, client):
+    item_id, (a, b, c, d) = _menu(app)
+    with app.app_context():
+        assert RecipeRequirement.add(item_id, a, 9999) is None
+        new_id = RecipeRequirement.add(item_id, d, 100)
+        assert new_id is not None
+        db.session.commit()
+        assert _recipe(item_id) == {a: 1000, b: 2000, c: 500, d: 100}
+
+    response = client.post(
+        "/recipe_requirements/new",
+        data={
+            "all_menu_items_possible": item_id,
+            "all_ingredients_possible": b,
+            "quantity_required": "7",
+        },
+    )
+    assert response.status_code == 200
+    assert "уже существует" in response.get_data(as_text=True)
+    with app.app_context():
+        assert _recipe(item_id)[b] == 2000
+        assert db.session.scalar(select(func.count(RecipeRequirement.id))) == 4
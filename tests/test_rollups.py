@@ -0,0 +1,91 @@
+from collections import Counter
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+
+from rucola_maze import rollups, seed
+from rucola_maze.extensions import db
+from rucola_maze.models import MenuItem, Purchase
+
+
+def _raw(start, end, granularity):
+    # the report computed purchase by purchase, as rows of (bucket,
+    # purchases, revenue_cents, cost_of_ingredients_milli_cents)
+    purchases, revenue, cost = Counter(), Counter(), Counter()
+    for purchase in Purchase.in_period(start, end):
+        if purchase.time is None:
+            continue
+        bucket = rollups.bucket_start(purchase.time, granularity)
+        menu_item = purchase.menu_item
+        purchases[bucket] += 1
+        revenue[bucket] += menu_item.price
+        cost[bucket] += sum(
+            rr.quantity_required_milli * rr.ingredient.unit_price
+            for rr in menu_item.in_recipe_requirements
+        )
+    return [
+        (bucket, purchases[bucket], revenue[bucket], cost[bucket])
+        for bucket in sorted(purchases)
+    ]
+
+
+def _report(start, end, granularity):
+    return [tuple(row) for row in rollups.report(start, end, granularity)]
+
+
+RANGES = [
+    (datetime(2023, 11, 1), datetime(2023, 12, 1), "day"),
+    (datetime(2023, 12, 24), datetime(2023, 12, 25), "hour"),
+    (None, datetime(2023, 10, 15), "day"),
+    (datetime(2023, 12, 20), None, "day"),
+]
+
+
+@pytest.fixture
+def sales(app):
+    with app.app_context():
+        seed.generate(ingredients=20, menu_items=8, requirements=3, purchases=3000)
+        # a dish without a recipe and a purchase without a time
+        item = MenuItem(title="вода", price=5000)
+        db.session.add(item)
+        db.session.flush()
+        untimed = Purchase(menu_item_id=item.id)
+        db.session.add_all(
+            [Purchase(menu_item_id=item.id, time=datetime(2023, 11, 5, 10)), untimed]
+        )
+        db.session.flush()
+        # time has a default, so NULL only gets there through an UPDATE
+        db.session.execute(
+            update(Purchase).where(Purchase.id == untimed.id).values(time=None)
+        )
+        rollups.rebuild()
+        db.session.commit()
+        return item.id
+
+
+@pytest.mark.parametrize("start, end, granularity", RANGES)
+def test_report_matches_the_purchases(app, sales, start, end, granularity):
+    with app.app_context():
+        expected = _raw(start, end, granularity)
+        assert expected
+        assert _report(start, end, granularity) == expected
+
+
+def test_sales_and_deletes_keep_rollups_in_step(app, client, sales):
+    with app.app_context():
+        purchase_id = Purchase.query.filter(Purchase.time.is_not(None)).first().id
+        null_time_id = Purchase.query.filter(Purchase.time.is_(None)).one().id
+        menu_item_id = next(iter(MenuItem.available_ids()))
+
+    response = client.post("/purchases/new", data={"available_menu_items": menu_item_id})
+    assert response.status_code == 302
+    for id in (purchase_id, null_time_id):
+        response = client.post(f"/purchases/{id}/delete", data={"yes": "1"})
+        assert response.status_code == 302
+
+    with app.app_context():
+        start = datetime.utcnow() - timedelta(days=400)
+        kept = _report(start, None, "day")
+        assert kept == _raw(start, None, "day")
+        rollups.rebuild()
+        assert _report(start, None, "day") == kept
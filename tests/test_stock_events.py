@@ -0,0 +1,198 @@
+import json
+import time
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select, update
+
+from rucola_maze import stock_events
+from rucola_maze.availability import mark_changed
+from rucola_maze.extensions import db
+from rucola_maze.models import (
+    Ingredient,
+    MenuItem,
+    RecipeRequirement,
+    StockChange,
+    StockListening,
+)
+
+TIMEOUT = 5  # seconds to wait for an event
+
+
+@pytest.fixture
+def broadcaster(app, monkeypatch):
+    # fast polls and keep-alives, so the tests never wait long
+    app.config["STOCK_EVENTS_POLL"] = 0.02
+    monkeypatch.setattr(stock_events, "HEARTBEAT", 0.1)
+    broadcaster = app.extensions["stock_events"]
+    yield broadcaster
+    broadcaster.close()
+
+
+@pytest.fixture
+def menu(app):
+    # two dishes, each needing half of the stock of its own ingredient
+    with app.app_context():
+        ids = {}
+        for name in ("a", "b"):
+            ingredient = Ingredient(
+                name=name, quantity_available_milli=1000, unit="кг", unit_price=100
+            )
+            item = MenuItem(title=f"блюдо {name}", price=1000)
+            db.session.add_all([ingredient, item])
+            db.session.flush()
+            db.session.add(
+                RecipeRequirement(
+                    menu_item_id=item.id,
+                    ingredient_id=ingredient.id,
+                    quantity_required_milli=500,
+                )
+            )
+            ids[name] = (ingredient.id, item.id)
+        db.session.commit()
+    return ids
+
+
+def _set_stock(app, ingredient_id, quantity):
+    with app.app_context():
+        db.session.execute(
+            update(Ingredient)
+            .where(Ingredient.id == ingredient_id)
+            .values(quantity_available_milli=quantity)
+        )
+        mark_changed(db.session, ingredient_ids=[ingredient_id])
+        db.session.commit()
+
+
+def _open(client, last_event_id=None):
+    headers = {} if last_event_id is None else {"Last-Event-ID": str(last_event_id)}
+    response = client.get("/api/stock/events", headers=headers, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    return response, iter(response.response)
+
+
+def _next_event(chunks):
+    # the next message that isn't a comment or the retry hint, as a dict
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        message = next(chunks)
+        if isinstance(message, bytes):
+            message = message.decode()
+        if message.startswith((":", "retry:")):
+            continue
+        event = {"event": "message"}
+        for line in message.strip().split("\n"):
+            field, _, value = line.partition(": ")
+            event[field] = value
+        event["data"] = json.loads(event["data"])
+        if "id" in event:
+            event["id"] = int(event["id"])
+        return event
+    raise AssertionError("no event")
+
+
+def _wait(predicate):
+    deadline = time.monotonic() + TIMEOUT
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_delta_lists_stock_and_availability_flips(app, client, broadcaster, menu):
+    a, dish_a = menu["a"]
+    response, chunks = _open(client)
+
+    committed = time.monotonic()
+    _set_stock(app, a, 200)
+    event = _next_event(chunks)
+    assert time.monotonic() - committed < 1
+    assert event["data"] == {
+        "ingredients": [{"id": a, "quantity_available_milli": 200}],
+        "menu_items": [{"id": dish_a, "available": False}],
+    }
+
+    # no flip this time: only the stock
+    _set_stock(app, a, 300)
+    assert _next_event(chunks)["data"] == {
+        "ingredients": [{"id": a, "quantity_available_milli": 300}],
+        "menu_items": [],
+    }
+    response.close()
+
+
+def test_one_poll_serves_every_subscriber(app, broadcaster, menu):
+    a, _ = menu["a"]
+    with app.app_context():
+        subscribers = [broadcaster.subscribe()[0] for _ in range(200)]
+        db.session.remove()
+
+    _set_stock(app, a, 100)
+    messages = [subscriber.queue.get(timeout=TIMEOUT) for subscriber in subscribers]
+    assert len(set(messages)) == 1
+    assert broadcaster.stats()["events"] == 1
+    assert broadcaster.stats()["subscribers"] == 200
+
+
+def test_reconnect_resumes_from_last_event_id(app, client, broadcaster, menu):
+    a, _ = menu["a"]
+    b, dish_b = menu["b"]
+    response, chunks = _open(client)
+    _set_stock(app, a, 900)
+    seen = _next_event(chunks)["id"]
+    response.close()
+
+    _set_stock(app, b, 0)  # while disconnected
+    response, chunks = _open(client, last_event_id=seen)
+    event = _next_event(chunks)
+    assert event["id"] > seen
+    assert event["data"]["ingredients"] == [{"id": b, "quantity_available_milli": 0}]
+    assert event["data"]["menu_items"] == [{"id": dish_b, "available": False}]
+    response.close()
+
+
+def test_reset_after_the_log_was_pruned(app, client, broadcaster, menu):
+    a, _ = menu["a"]
+    response, chunks = _open(client)
+    _set_stock(app, a, 900)
+    seen = _next_event(chunks)["id"]
+    response.close()
+    _wait(lambda: broadcaster.thread is None)
+
+    _set_stock(app, a, 800)
+    with app.app_context():
+        stock_events.prune(db.session.connection(), retention=-60)  # everything
+        db.session.commit()
+    _set_stock(app, a, 700)
+
+    response, chunks = _open(client, last_event_id=seen)
+    assert _next_event(chunks)["event"] == "reset"
+    response.close()
+
+
+def test_nothing_is_logged_without_listeners(app, client, broadcaster, menu):
+    a, _ = menu["a"]
+    _set_stock(app, a, 900)
+    with app.app_context():
+        assert db.session.scalar(select(func.count(StockChange.id))) == 0
+
+    response, chunks = _open(client)
+    _set_stock(app, a, 800)
+    seen = _next_event(chunks)["id"]
+    response.close()
+    _wait(lambda: broadcaster.thread is None)
+
+    # the last stream closed longer ago than the retention
+    with app.app_context():
+        db.session.execute(
+            update(StockListening).values(seen_at=datetime.utcnow() - timedelta(days=1))
+        )
+        db.session.commit()
+        logged = db.session.scalar(select(func.count(StockChange.id)))
+    _set_stock(app, a, 700)
+    with app.app_context():
+        assert db.session.scalar(select(func.count(StockChange.id))) == logged
+
+    # the change above was never logged, so resuming must start over
+    response, chunks = _open(client, last_event_id=seen)
+    assert _next_event(chunks)["event"] == "reset"
+    response.close()
@@ -0,0 +1,65 @@
+from datetime import datetime
+from decimal import Decimal
+
+from rucola_maze import archive, seed
+from rucola_maze.extensions import db
+from rucola_maze.models import (
+    Ingredient,
+    MenuItem,
+    Purchase,
+    RecipeRequirement,
+)
+
+
+def _python_totals():
+    # the dashboard's old loops: every purchase, every requirement of its dish
+    revenue_cents = 0
+    cost_of_ingredients_cents = Decimal(0)
+    for purchase in Purchase.query.all():
+        revenue_cents += purchase.menu_item.price
+        for rr in purchase.menu_item.in_recipe_requirements:
+            cost_of_ingredients_cents += rr.ingredient.unit_price * rr.quantity_required
+    return revenue_cents, cost_of_ingredients_cents
+
+
+def _sql_totals():
+    return Purchase.revenue_cents(), Purchase.cost_of_ingredients_cents()
+
+
+def test_sql_totals_match_the_per_purchase_sums(app, client):
+    with app.app_context():
+        seed.generate(ingredients=30, menu_items=15, requirements=4, purchases=1500)
+        # a dish without a recipe, and one needing a fraction of a unit
+        water = MenuItem(title="вода", price=5050)
+        tea = MenuItem(title="чай", price=7099)
+        leaves = Ingredient(
+            name="чай", quantity_available_milli=10_000, unit="кг", unit_price=123_457
+        )
+        db.session.add_all([water, tea, leaves])
+        db.session.flush()
+        db.session.add(
+            RecipeRequirement(
+                menu_item_id=tea.id, ingredient_id=leaves.id, quantity_required_milli=7
+            )
+        )
+        db.session.add(Purchase(menu_item_id=water.id))
+        db.session.add_all([Purchase(menu_item_id=tea.id) for _ in range(4)])
+        db.session.commit()
+
+        revenue_cents, cost_cents = _python_totals()
+        assert _sql_totals() == (revenue_cents, cost_cents)
+        assert cost_cents != cost_cents.to_integral_value()  # fractions are kept
+
+    page = client.get("/").get_data(as_text=True)
+    assert f"{Decimal(revenue_cents) / 100} руб." in page
+    assert f"{cost_cents / 100} руб." in page
+
+
+def test_sql_totals_count_archived_purchases(app):
+    with app.app_context():
+        seed.generate(ingredients=20, menu_items=10, requirements=3, purchases=1000)
+        db.session.commit()
+        expected = _python_totals()
+        assert archive.archive(datetime(2023, 11, 15), pause=0) > 0
+        assert _python_totals() != expected  # the loops only see live purchases
+        assert _sql_totals() == expected
@@ -0,0 +1,92 @@
+from sqlalchemy import update
+
+from rucola_maze.extensions import db
+from rucola_maze.models import Ingredient, User
+
+
+def _ingredient(app):
+    with app.app_context():
+        ingredient = Ingredient(
+            name="мука", quantity_available_milli=1000, unit="кг", unit_price=100
+        )
+        db.session.add(ingredient)
+        db.session.commit()
+        return ingredient.id
+
+
+def _get(client, etag=None):
+    headers = {} if etag is None else {"If-None-Match": etag}
+    return client.get("/ingredients/", headers=headers)
+
+
+def test_unchanged_page_is_not_modified(app, client):
+    _ingredient(app)
+    first = _get(client)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+    second = _get(client, etag)
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.get_data() == b""
+
+
+def test_writes_change_the_etag(app, client):
+    ingredient_id = _ingredient(app)
+    etag = _get(client).headers["ETag"]
+
+    # through the unit of work
+    with app.app_context():
+        db.session.get(Ingredient, ingredient_id).quantity_available_milli = 2000
+        db.session.commit()
+    response = _get(client, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    etag = response.headers["ETag"]
+
+    # a bulk UPDATE run through the session
+    with app.app_context():
+        db.session.execute(
+            update(Ingredient)
+            .where(Ingredient.id == ingredient_id)
+            .values(quantity_available_milli=3000)
+        )
+        db.session.commit()
+    response = _get(client, etag)
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_rolled_back_write_keeps_the_etag(app, client):
+    ingredient_id = _ingredient(app)
+    etag = _get(client).headers["ETag"]
+    with app.app_context():
+        db.session.get(Ingredient, ingredient_id).quantity_available_milli = 0
+        db.session.flush()
+        db.session.rollback()
+    assert _get(client, etag).status_code == 304
+
+
+def test_etag_depends_on_the_url_and_the_user(app, client):
+    _ingredient(app)
+    etag = _get(client).headers["ETag"]
+    page = client.get("/ingredients/?per_page=1", headers={"If-None-Match": etag})
+    assert page.status_code == 200
+    with app.app_context():
+        other = User(username="other", email="other@example.com")
+        other.set_password("other")
+        db.session.add(other)
+        db.session.commit()
+    other = app.test_client()
+    other.post("/auth/login", data={"email": "other@example.com", "password": "other"})
+    other.get("/")
+    assert _get(other, etag).status_code == 200
+
+
+def test_pending_flash_is_always_rendered(app, client, user):
+    _ingredient(app)
+    etag = _get(client).headers["ETag"]
+    client.post("/auth/login", data=user)  # flashes, then the page is shown
+    response = _get(client, etag)
+    assert response.status_code == 200
+    assert "Вы вошли как" in response.get_data(as_text=True)